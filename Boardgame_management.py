@@ -5,110 +5,2631 @@ Created on Sun Sep  7 14:33:11 2025
 @author: 35908
 """
 
+import argparse
+import ast
+import codecs
+import cProfile
 import csv
+import functools
+import hashlib
+import io
+import json
+import math
+import mmap
 import os
-from datetime import datetime
-import matplotlib.pyplot as plt
-from collections import defaultdict
+import pstats
+import queue
+import random
+import re
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from itertools import chain
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans', 'Arial']
-plt.rcParams['axes.unicode_minus'] = False
+from tkinter import ttk, messagebox, simpledialog, filedialog
+
+# matplotlib 和 numpy 导入较慢，只在第一次画图或使用向量化统计时才导入
+def import_matplotlib():
+    """导入 matplotlib 并设置中文字体，重复调用没有额外开销"""
+    import matplotlib
+    matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans', 'Arial']
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    return matplotlib
+
+def import_numpy():
+    """导入 numpy；向量化统计为可选功能，未安装时返回None"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+class Instrumentation:
+    """热点操作的耗时和计数统计，默认关闭
+
+    被 instrumented 装饰的函数在关闭时只多一次属性检查。开启后记录每次调用的耗时，
+    保留最近 window 次用于计算 p95；另外可以用 cProfile 记录界面线程和后台任务的完整调用情况。
+    """
+
+    # 每个操作保留的最近耗时个数
+    window = 1000
+    # Python 3.12 起 cProfile 基于 sys.monitoring，对所有线程生效，且同一时间只能启用一个
+    profile_all_threads = sys.version_info >= (3, 12)
 
-class GameScoreSystem:
     def __init__(self):
-        # 数据文件
-        self.players_file = "players.csv"
-        self.games_file = "games.csv"
+        self.enabled = False
+        self.lock = threading.Lock()
+        # 操作名 -> 最近的耗时（秒）
+        self.samples = {}
+        self.calls = {}
+        self.totals = {}
+        # 计数器名 -> 次数
+        self.counters = {}
+        # 界面线程的 cProfile，以及后台任务各自的 cProfile
+        self.profiler = None
+        self.task_profilers = []
+
+    def record(self, name, seconds):
+        """记录一次调用的耗时"""
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.totals[name] = self.totals.get(name, 0) + seconds
+
+    def count(self, name, n=1):
+        """计数器加n，统计关闭时不记录"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self):
+        """清空已有的统计"""
+        with self.lock:
+            self.samples.clear()
+            self.calls.clear()
+            self.totals.clear()
+            self.counters.clear()
+
+    def summary(self):
+        """返回 {操作名: {'count', 'last', 'avg', 'p95'}}，时间单位为秒"""
+        with self.lock:
+            summary = {}
+            for name, samples in self.samples.items():
+                ordered = sorted(samples)
+                summary[name] = {
+                    'count': self.calls[name],
+                    'last': samples[-1],
+                    'avg': self.totals[name] / self.calls[name],
+                    'p95': ordered[math.ceil(len(ordered) * 0.95) - 1]
+                }
+            return summary
+
+    def counter_values(self):
+        """返回计数器的副本"""
+        with self.lock:
+            return dict(self.counters)
+
+    def dump_json(self, path):
+        """把耗时统计和计数器写入JSON文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'timings': self.summary(), 'counters': self.counter_values()}, f,
+                      ensure_ascii=False, indent=2)
+
+    def start_profile(self):
+        """开始在界面线程和之后的后台任务中记录 cProfile，已有其他分析工具在运行时抛出 ValueError"""
+        with self.lock:
+            self.task_profilers = []
+        profiler = cProfile.Profile()
+        profiler.enable()
+        self.profiler = profiler
+
+    def stop_profile(self, path):
+        """停止记录，把界面线程和后台任务的结果合并写入 path（可用 pstats 或 snakeviz 查看）"""
+        profiler, self.profiler = self.profiler, None
+        profiler.disable()
+        stats = pstats.Stats(profiler)
+        with self.lock:
+            task_profilers, self.task_profilers = self.task_profilers, []
+        for task_profiler in task_profilers:
+            stats.add(task_profiler)
+        stats.dump_stats(path)
+
+    def run_task(self, func, args):
+        """在后台线程执行 func(*args)
+
+        cProfile 在 Python 3.12 之前只作用于启动它的线程，所以后台任务单独记录；
+        之后界面线程的 cProfile 已包含后台线程，直接执行。
+        """
+        if self.profiler is None or self.profile_all_threads:
+            return func(*args)
+        task_profiler = cProfile.Profile()
+        try:
+            task_profiler.enable()
+        except ValueError:
+            # 其他分析工具（例如调试器）已占用，本任务不记录
+            return func(*args)
+        try:
+            return func(*args)
+        finally:
+            task_profiler.disable()
+            with self.lock:
+                self.task_profilers.append(task_profiler)
+
+instrumentation = Instrumentation()
+
+def instrumented(func):
+    """记录函数的耗时，统计名称为函数的限定名"""
+    name = func.__qualname__
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not instrumentation.enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            instrumentation.record(name, time.perf_counter() - start)
+    return wrapper
+
+# 同分时的名次规则
+#   competition: 标准竞赛排名，同分玩家并列取最高名次（如 1、1、3）
+#   winner: 与 competition 相同，但并列第一时只有记录中的胜者（choose_winner_dialog 选出的玩家）排第一，
+#           其余并列者排第二（如 1、2、3）
+TIE_RULES = ('competition', 'winner')
+
+class PlayerRegistry:
+    """玩家名称与整数编号的对应表
+
+    内存中的游戏记录和各项统计只保存编号，名称只在界面显示和文件读写时转换。
+    编号从0开始连续分配且不回收，可以直接作为数组下标，与 players.csv 中的 id 无关。
+    """
+
+    def __init__(self, names=()):
+        self.ids = {}
+        self.names = []
+        for name in names:
+            self.intern(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """返回名称的编号，新名称分配下一个编号"""
+        player_id = self.ids.get(name)
+        if player_id is None:
+            player_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return player_id
+
+    def get(self, name):
+        """名称的编号，没有登记过时返回None"""
+        return self.ids.get(name)
+
+class GameRecord:
+    """一局游戏的紧凑记录：参与者编号、分数和名次按座位顺序存放在元组中，日期字符串经过驻留
+
+    统计代码直接读取这些属性。文件读写、报告等需要名称的地方通过 game['scores'] 等键读取，
+    得到以名称为键的新字典（修改它不会改变记录）。
+    经过 rank_game 加入内存之后记录不再修改（清除玩家时用 without_seat 生成新记录替换），
+    后台线程可以不加锁地读取记录列表的副本。
+    """
+
+    __slots__ = ('registry', 'date', 'player_count', 'player_ids', 'scores', 'winner_id', 'ranks')
+
+    def __init__(self, registry, date, player_count, player_ids, scores, winner_id):
+        self.registry = registry
+        self.date = sys.intern(date)
+        self.player_count = player_count
+        self.player_ids = player_ids
+        self.scores = scores
+        self.winner_id = winner_id
+        # 由 rank_game 计算
+        self.ranks = None
+
+    @classmethod
+    def from_dict(cls, game, registry):
+        """由文件解析或界面录入的字典记录（date/player_count/scores/winner）创建"""
+        scores = game['scores']
+        return cls(registry, game['date'], int(game['player_count']),
+                   tuple(map(registry.intern, scores)),
+                   tuple(scores.values()), registry.intern(game['winner']))
+
+    @property
+    def rank_percentages(self):
+        """每个座位的排名百分比，由名次和人数查表得到，不单独保存"""
+        table = rank_percentage_table(self.player_count, len(self.ranks))
+        return tuple([table[rank] for rank in self.ranks])
+
+    def seat(self, player_id):
+        """玩家在本局中的座位下标，未参加时返回None"""
+        try:
+            return self.player_ids.index(player_id)
+        except ValueError:
+            return None
+
+    def without_seat(self, seat):
+        """返回移除一个座位的玩家及其分数的新记录，名次需要重新计算"""
+        return GameRecord(self.registry, self.date, self.player_count,
+                          self.player_ids[:seat] + self.player_ids[seat + 1:],
+                          self.scores[:seat] + self.scores[seat + 1:], self.winner_id)
+
+    def __getitem__(self, key):
+        if key == 'date':
+            return self.date
+        if key == 'player_count':
+            return self.player_count
+        if key == 'winner':
+            return self.registry.names[self.winner_id]
+        if key in ('scores', 'ranks', 'rank_percentages'):
+            return dict(zip(map(self.registry.names.__getitem__, self.player_ids), getattr(self, key)))
+        raise KeyError(key)
+
+    def to_dict(self):
+        """转换为以名称为键的字典记录"""
+        return {'date': self.date, 'player_count': self.player_count, 'scores': self['scores'], 'winner': self['winner']}
+
+@functools.lru_cache(maxsize=None)
+def rank_percentage_table(player_count, seats):
+    """人数为 player_count 时名次 0..seats 的排名百分比（100%为第一名，0%为最后一名），以名次为下标"""
+    if player_count <= 1:
+        return (100,) * (seats + 1)
+    return tuple((player_count - rank) / (player_count - 1) * 100 for rank in range(seats + 1))
+
+def rank_game(game, tie_rule='competition'):
+    """计算一局中每个座位的名次，保存到记录的 ranks 中"""
+    if tie_rule not in TIE_RULES:
+        raise ValueError(f"未知的同分规则: {tie_rule}")
+    # 每局只排序一次，分数相同的玩家取最高名次
+    score_ranks = {}
+    for rank, score in enumerate(sorted(game.scores, reverse=True), 1):
+        score_ranks.setdefault(score, rank)
+    ranks = [score_ranks[score] for score in game.scores]
+    if tie_rule == 'winner':
+        winner_seat = game.seat(game.winner_id)
+        if winner_seat is not None and ranks[winner_seat] == 1:
+            ranks = [2 if rank == 1 and seat != winner_seat else rank for seat, rank in enumerate(ranks)]
+    game.ranks = tuple(ranks)
+    return game
+
+class LeaderboardStats:
+    """按玩家累计的统计数据，新增或删除一局游戏时只更新该局的参与者
+
+    统计按玩家编号保存，按名称查询时通过 registry 转换。游戏记录需要先经过 rank_game 计算名次。
+    """
+
+    def __init__(self, registry, games=()):
+        self.registry = registry
+        # 玩家编号 -> 累计数据
+        self.players = {}
+        # 全部分数出现的次数，用于全系统最高分/最低分
+        self.score_counts = defaultdict(int)
+        for game in games:
+            self.add_game(game)
+
+    def _player_stats(self, player_id):
+        """获取玩家的累计数据，不存在时创建"""
+        player_stats = self.players.get(player_id)
+        if player_stats is None:
+            player_stats = {
+                'weighted_wins': 0,
+                'wins_by_player_count': defaultdict(int),
+                'total_games': 0,
+                'rank_percentage_sum': 0
+            }
+            self.players[player_id] = player_stats
+        return player_stats
+
+    def add_game(self, game, sign=1):
+        """把一局游戏计入统计，sign为-1时撤销该局的贡献"""
+        player_count = game.player_count
+        winner_id = game.winner_id
+        rank_percentages = rank_percentage_table(player_count, len(game.ranks))
+        for player_id, player_score, rank in zip(game.player_ids, game.scores, game.ranks):
+            self.score_counts[player_score] += sign
+            if self.score_counts[player_score] == 0:
+                del self.score_counts[player_score]
+            player_stats = self._player_stats(player_id)
+            player_stats['total_games'] += sign
+            player_stats['rank_percentage_sum'] += sign * rank_percentages[rank]
+            if player_id == winner_id:
+                player_stats['wins_by_player_count'][player_count] += sign
+                player_stats['weighted_wins'] += sign * player_count
+            if player_stats['total_games'] == 0:
+                # 撤销到没有任何对局时清除浮点误差
+                del self.players[player_id]
+
+    def remove_game(self, game):
+        """撤销一局游戏的贡献（删除或修改记录前调用）"""
+        self.add_game(game, sign=-1)
+
+    def score_range(self):
+        """返回全系统的 (最低分, 最高分)，没有记录时返回None"""
+        if not self.score_counts:
+            return None
+        return min(self.score_counts), max(self.score_counts)
+
+    def rating(self, player_name):
+        """返回玩家的 (rating, 总局数, 获胜局数)"""
+        player_stats = self.players.get(self.registry.get(player_name))
+        if player_stats is None:
+            return 0, 0, 0
+        total_games = player_stats['total_games']
+        wins = sum(player_stats['wins_by_player_count'].values())
+        return player_stats['weighted_wins'] / total_games, total_games, wins
+
+    def avg_rank_percentage(self, player_name):
+        """返回玩家的 (平均排名百分比, 总局数)"""
+        player_stats = self.players.get(self.registry.get(player_name))
+        if player_stats is None:
+            return 0, 0
+        total_games = player_stats['total_games']
+        return player_stats['rank_percentage_sum'] / total_games, total_games
+
+    def leaderboard(self, player_names):
+        """返回每个玩家的Rating、获胜局数、总局数和平均排名百分比"""
+        leaderboard = {}
+        for player_name in player_names:
+            rating, total_games, wins = self.rating(player_name)
+            avg_rank_percentage, _ = self.avg_rank_percentage(player_name)
+            leaderboard[player_name] = {
+                'name': player_name,
+                'rating': rating,
+                'wins': wins,
+                'total_games': total_games,
+                'avg_rank_percentage': avg_rank_percentage
+            }
+        return leaderboard
+
+class EloRatings:
+    """多人Elo评分，按日期顺序逐局流式更新
+
+    每局拆成参与者两两之间的比赛：名次高者得1分，名次相同各得0.5分，期望得分由双方评分决定，
+    一局的评分变化为 K/(人数-1) × Σ(实际得分 - 期望得分)。玩家评分和对局数保存在以 registry 中的玩家编号
+    为下标的紧凑数组中。游戏记录需要先经过 rank_game。
+    """
+
+    initial_rating = 1500.0
+    k_factor = 32.0
+
+    def __init__(self, registry, games=()):
+        self.registry = registry
+        self.ratings = array('d')
+        self.game_counts = array('q')
+        # 已处理的记录数（游戏列表的前缀长度）和最后处理的对局日期
+        self.applied = 0
+        self.last_date = ''
+        # 出现了日期早于已处理对局的新记录，流式结果不再准确，需要重新计算
+        self.stale = False
+        for game in sorted(games, key=lambda game: game.date):
+            self._apply(game)
+        self.applied = len(games)
+
+    def catch_up(self, games):
+        """按记录顺序处理 games 中尚未处理的新记录"""
+        for game in games[self.applied:]:
+            if game.date < self.last_date:
+                self.stale = True
+            elif not self.stale:
+                self._apply(game)
+        self.applied = len(games)
+
+    def _apply(self, game):
+        """用一局的结果更新参与者的评分"""
+        self.last_date = game.date
+        rank_values = game.ranks
+        player_count = len(rank_values)
+        if player_count < 2:
+            return
+        missing = len(self.registry) - len(self.ratings)
+        if missing > 0:
+            # 新登记的玩家从初始评分开始
+            self.ratings.extend([self.initial_rating] * missing)
+            self.game_counts.extend([0] * missing)
+        ids = game.player_ids
+        ratings = self.ratings
+        strengths = [10 ** (ratings[player_id] / 400) for player_id in ids]
+        # 实际得分减期望得分，两两之间只计算一次
+        surplus = [0.0] * player_count
+        for a in range(player_count - 1):
+            strength_a = strengths[a]
+            rank_a = rank_values[a]
+            for b in range(a + 1, player_count):
+                expected = strength_a / (strength_a + strengths[b])
+                rank_b = rank_values[b]
+                if rank_a < rank_b:
+                    actual = 1.0
+                elif rank_a == rank_b:
+                    actual = 0.5
+                else:
+                    actual = 0.0
+                surplus[a] += actual - expected
+                surplus[b] -= actual - expected
+        scale = self.k_factor / (player_count - 1)
+        for player_id, value in zip(ids, surplus):
+            ratings[player_id] += scale * value
+            self.game_counts[player_id] += 1
+
+    def rating(self, player_name):
+        """返回玩家的 (Elo评分, 计入的对局数)"""
+        player_id = self.registry.get(player_name)
+        if player_id is None or player_id >= len(self.ratings):
+            return self.initial_rating, 0
+        return self.ratings[player_id], self.game_counts[player_id]
+
+class HeadToHead:
+    """两两交锋统计：每对同场过的玩家的同局数、各自名次领先的次数和分差总和
+
+    以按编号排序的玩家编号对为键稀疏保存，只有同场过的玩家对才有记录。新增或删除一局游戏时只更新该局的玩家对。
+    游戏记录需要先经过 rank_game。
+    """
+
+    def __init__(self, registry, games=()):
+        self.registry = registry
+        # (编号较小的玩家, 编号较大的玩家) -> [同局数, 前者领先次数, 后者领先次数, 前者减后者的分差总和]
+        self.pairs = {}
+        for game in games:
+            self.add_game(game)
+
+    def add_game(self, game, sign=1):
+        """把一局游戏计入统计，sign为-1时撤销该局的贡献"""
+        # 按编号排序的 (编号, 名次, 分数)，一局中编号不重复
+        seats = sorted(zip(game.player_ids, game.ranks, game.scores))
+        for i, (first, first_rank, first_score) in enumerate(seats):
+            for second, second_rank, second_score in seats[i + 1:]:
+                key = (first, second)
+                entry = self.pairs.get(key)
+                if entry is None:
+                    entry = self.pairs[key] = [0, 0, 0, 0]
+                entry[0] += sign
+                if first_rank < second_rank:
+                    entry[1] += sign
+                elif second_rank < first_rank:
+                    entry[2] += sign
+                entry[3] += sign * (first_score - second_score)
+                if entry[0] == 0:
+                    del self.pairs[key]
+
+    def remove_game(self, game):
+        """撤销一局游戏的贡献（删除或修改记录前调用）"""
+        self.add_game(game, sign=-1)
+
+    def pair(self, player, opponent):
+        """player 对 opponent 的交锋记录，没有同场过时返回None"""
+        return self._pair(self.registry.get(player), self.registry.get(opponent))
+
+    def _pair(self, player_id, opponent_id):
+        if player_id is None or opponent_id is None:
+            return None
+        if player_id < opponent_id:
+            entry = self.pairs.get((player_id, opponent_id))
+            if entry is None:
+                return None
+            games, above, below, score_diff = entry
+        else:
+            entry = self.pairs.get((opponent_id, player_id))
+            if entry is None:
+                return None
+            games, below, above, score_diff = entry
+            score_diff = -score_diff
+        names = self.registry.names
+        return {
+            'player': names[player_id],
+            'opponent': names[opponent_id],
+            'games': games,
+            'above': above,
+            'below': below,
+            'ties': games - above - below,
+            'avg_score_diff': score_diff / games
+        }
+
+    def rows(self, player_names, player=None, min_games=1):
+        """列出交锋记录：指定 player 时为其对每个对手的记录，否则为 player_names 中每对玩家的记录"""
+        player_ids = {self.registry.get(player_name) for player_name in player_names}
+        player_id = self.registry.get(player) if player is not None else None
+        names = self.registry.names
+        rows = []
+        for first, second in self.pairs:
+            if first not in player_ids or second not in player_ids:
+                continue
+            if player is None:
+                # 每对玩家按名称顺序列出
+                row = self._pair(first, second) if names[first] < names[second] else self._pair(second, first)
+            elif player_id in (first, second):
+                row = self._pair(player_id, second if player_id == first else first)
+            else:
+                continue
+            if row['games'] >= min_games:
+                rows.append(row)
+        return rows
+
+# 滚动排行榜的范围：最近N局、最近N天、按月、按季度
+ROLLING_WINDOWS = ('games', 'days', 'month', 'season')
+
+def game_period(date, kind):
+    """对局日期所属的月份（2025-03）或季度（2025-Q1），日期无法识别时返回None"""
+    try:
+        year, month = int(date[:4]), int(date[5:7])
+    except ValueError:
+        return None
+    if kind == 'month':
+        return f"{year:04d}-{month:02d}"
+    return f"{year:04d}-Q{(month - 1) // 3 + 1}"
+
+class RollingLeaderboards:
+    """最近N局、最近N天和按月/季度的排行榜统计
+
+    每个窗口用一个 LeaderboardStats 保存窗口内的累计数据：新对局计入，滑出窗口的最旧对局撤销，
+    切换或更新窗口时不需要重新扫描全部记录。每种窗口在第一次使用时建立，
+    最近N局和最近N天的窗口各只保留最近使用的 max_windows 个。
+    记录被修改（例如清除已删除的玩家）后调用 invalidate，之后使用时重建。
+    排行榜在后台线程读取、新对局在界面线程计入，所以各方法都持有锁。
+    """
+
+    # 最近N局、最近N天的窗口各保留的个数
+    max_windows = 4
+
+    def __init__(self, registry, games):
+        self.registry = registry
+        self.games = games
+        self.lock = threading.RLock()
+        self.invalidate()
+
+    def invalidate(self):
+        """丢弃全部窗口"""
+        with self.lock:
+            # 局数 -> [统计, 窗口第一局在 games 中的位置]，按使用顺序排列
+            self.game_windows = OrderedDict()
+            # 天数 -> [统计, 窗口第一局在 date_order 中的下标, 起始日期]，按使用顺序排列
+            self.day_windows = OrderedDict()
+            # 按日期排序的游戏位置和对应日期，最近N天的窗口共用
+            self.date_order = None
+            self.sorted_dates = None
+            # (month/season, 周期) -> 统计
+            self.period_stats = None
+
+    def add_game(self, position, game):
+        """新对局（已追加到 games 末尾）计入所有已建立的窗口"""
+        with self.lock:
+            for count, window in self.game_windows.items():
+                stats = window[0]
+                stats.add_game(game)
+                # 超出局数的最旧对局滑出窗口
+                while len(self.games) - window[1] > count:
+                    stats.remove_game(self.games[window[1]])
+                    window[1] += 1
+
+            if self.date_order is not None:
+                # 通常是当天的记录，插入位置就在末尾
+                index = bisect_right(self.sorted_dates, game.date)
+                self.date_order.insert(index, position)
+                self.sorted_dates.insert(index, game.date)
+                for window in self.day_windows.values():
+                    if game.date < window[2]:
+                        window[1] += 1
+                    else:
+                        window[0].add_game(game)
+
+            if self.period_stats is not None:
+                self._add_to_periods(game)
+
+    def last_games(self, count):
+        """最近count局的统计"""
+        with self.lock:
+            window = self.game_windows.get(count)
+            if window is None:
+                start = max(0, len(self.games) - count)
+                window = self.game_windows[count] = [LeaderboardStats(self.registry, self.games[start:]), start]
+                self._evict(self.game_windows)
+            self.game_windows.move_to_end(count)
+            return window[0]
+
+    def last_days(self, days, today=None):
+        """最近days天（含今天）的统计，日期推移后移出过期的对局"""
+        today = today or datetime.now()
+        cutoff = (today - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        with self.lock:
+            if self.date_order is None:
+                self.date_order = sorted(range(len(self.games)), key=lambda position: self.games[position].date)
+                self.sorted_dates = [self.games[position].date for position in self.date_order]
+            window = self.day_windows.get(days)
+            if window is None:
+                start = bisect_left(self.sorted_dates, cutoff)
+                stats = LeaderboardStats(self.registry, (self.games[position] for position in self.date_order[start:]))
+                window = self.day_windows[days] = [stats, start, cutoff]
+                self._evict(self.day_windows)
+            self.day_windows.move_to_end(days)
+            stats, start, _ = window
+            while start < len(self.sorted_dates) and self.sorted_dates[start] < cutoff:
+                stats.remove_game(self.games[self.date_order[start]])
+                start += 1
+            window[1] = start
+            window[2] = max(window[2], cutoff)
+            return stats
+
+    def _evict(self, windows):
+        """丢弃最久未使用的窗口，之后新对局不再计入它们"""
+        while len(windows) > self.max_windows:
+            windows.popitem(last=False)
+
+    def _add_to_periods(self, game):
+        for kind in ('month', 'season'):
+            period = game_period(game.date, kind)
+            if period is not None:
+                stats = self.period_stats.get((kind, period))
+                if stats is None:
+                    stats = self.period_stats[(kind, period)] = LeaderboardStats(self.registry)
+                stats.add_game(game)
+
+    def _ensure_periods(self):
+        """一次遍历建立所有月份和季度的统计"""
+        if self.period_stats is None:
+            self.period_stats = {}
+            for game in self.games:
+                self._add_to_periods(game)
+
+    def periods(self, kind):
+        """有记录的月份或季度，从新到旧"""
+        with self.lock:
+            self._ensure_periods()
+            return sorted((period for period_kind, period in self.period_stats if period_kind == kind),
+                          reverse=True)
+
+    def period(self, kind, period):
+        """某个月份或季度的统计"""
+        with self.lock:
+            self._ensure_periods()
+            return self.period_stats.get((kind, period)) or LeaderboardStats(self.registry)
+
+    def stats(self, kind, value):
+        """按窗口种类（见 ROLLING_WINDOWS）和参数（局数、天数或周期）返回统计
+
+        返回的统计会随新对局更新，读取时需要持有 lock。
+        """
+        if kind == 'games':
+            return self.last_games(value)
+        if kind == 'days':
+            return self.last_days(value)
+        return self.period(kind, value)
+
+# games.csv 分数列的编码版本：v1 为Python字典的repr，v2 为JSON
+SCORES_FORMAT_VERSION = 2
+GAME_FIELDNAMES = {
+    1: ['date', 'player_count', 'scores', 'winner'],
+    2: ['date', 'player_count', 'scores_json', 'winner'],
+}
+
+class GameCsvParser:
+    """流式解析游戏记录CSV，根据表头识别分数列的编码版本"""
+
+    def __init__(self, f):
+        self.reader = csv.reader(f)
+        header = next(self.reader, None) or GAME_FIELDNAMES[SCORES_FORMAT_VERSION]
+        if 'scores_json' in header:
+            self.version = 2
+            self.decode_scores = json.loads
+            scores_column = 'scores_json'
+        elif 'scores' in header:
+            # 旧格式只按字面量解析，不再执行文件中的代码
+            self.version = 1
+            self.decode_scores = ast.literal_eval
+            scores_column = 'scores'
+        else:
+            raise ValueError(f"无法识别的游戏数据表头: {header}")
+        self.date_index = header.index('date')
+        self.player_count_index = header.index('player_count')
+        self.scores_index = header.index(scores_column)
+        self.winner_index = header.index('winner')
+
+    def parse_row(self, row):
+        """把一行CSV转换为游戏记录"""
+        return {
+            'date': row[self.date_index],
+            'player_count': int(row[self.player_count_index]),
+            'scores': self.decode_scores(row[self.scores_index]),
+            'winner': row[self.winner_index]
+        }
+
+    def __iter__(self):
+        for row in self.reader:
+            # 与DictReader一样跳过空行
+            if row:
+                yield self.parse_row(row)
+
+class StreamDecoder:
+    """按块解码文件字节流，从第一行非ASCII内容识别编码，整个文件只读一遍"""
+
+    # 依次尝试的编码，GBK 常见于中文Windows系统
+    candidates = ('utf-8', 'gbk')
+
+    def __init__(self, f, encoding=None, chunk_size=1 << 20):
+        self.f = f
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+
+    def _sniff(self, data):
+        """用第一行含非ASCII字符的内容确定编码；整块判断时，混入的其他编码的行会使整块按错误的编码解码"""
+        first = re.search(rb'[\x80-\xff]', data).start()
+        end = data.find(b'\n', first)
+        line = data[data.rfind(b'\n', 0, first) + 1:end if end >= 0 else len(data)]
+        for encoding in self.candidates:
+            try:
+                line.decode(encoding)
+                return encoding
+            except UnicodeDecodeError:
+                pass
+        return self.candidates[0]
+
+    def _decode_line(self, line):
+        """单行解码，依次尝试已识别的编码和候选编码"""
+        for encoding in (self.encoding,) + self.candidates:
+            try:
+                return line.decode(encoding)
+            except UnicodeDecodeError:
+                pass
+        # 如果都失败，忽略错误字符
+        return line.decode(self.candidates[0], errors='ignore')
+
+    def _decode(self, data):
+        """解码以换行结尾的一块数据"""
+        if self.encoding is None:
+            # 纯ASCII内容在各候选编码下结果相同，留到出现非ASCII字符时再识别
+            if data.isascii():
+                return data.decode('ascii')
+            self.encoding = self._sniff(data)
+        try:
+            return data.decode(self.encoding)
+        except UnicodeDecodeError:
+            # 块内混有其他编码的行（例如外部脚本追加的记录），逐行解码
+            return ''.join(self._decode_line(line) for line in data.splitlines(keepends=True))
+
+    def _lines(self, text):
+        # 只按\n切分，保证每行都带着行尾交给csv模块
+        lines = text.split('\n')
+        for line in lines[:-1]:
+            yield line + '\n'
+        if lines[-1]:
+            yield lines[-1]
+
+    def __iter__(self):
+        pending = b''
+        first_chunk = True
+        while True:
+            chunk = self.f.read(self.chunk_size)
+            if not chunk:
+                break
+            data = pending + chunk
+            if first_chunk:
+                first_chunk = False
+                if data.startswith(codecs.BOM_UTF8):
+                    data = data[len(codecs.BOM_UTF8):]
+                    self.encoding = self.encoding or 'utf-8'
+            # GBK 和 UTF-8 的多字节字符都不含\n，按最后一个\n切块不会截断字符
+            cut = data.rfind(b'\n') + 1
+            pending = data[cut:]
+            if cut:
+                yield from self._lines(self._decode(data[:cut]))
+        if pending:
+            yield from self._lines(self._decode(pending))
+
+class GameSnapshot:
+    """games.csv 的二进制列式快照，启动时内存映射读取，省去文本解析
+
+    文件结构: 魔数 | 元数据长度 | JSON元数据(来源文件信息、玩家名表、日期表、各列位置) | 按8字节对齐的各列数组
+    各列位置是相对于数据区起点（元数据之后按8字节对齐）的偏移。
+    每局的参与者存放在 player_ids/scores 中，game_offsets[i]:game_offsets[i+1] 是第i局的范围。
+    """
+
+    magic = b'BGSNAP01'
+    # 列名 -> array 类型码
+    columns = {
+        'game_offsets': 'q',
+        'player_ids': 'i',
+        'scores': 'i',
+        'player_counts': 'i',
+        'date_ids': 'i',
+        'winner_ids': 'i',
+    }
+    # 计算来源文件指纹时读取的首尾字节数
+    hash_window = 1 << 16
+
+    def __init__(self, snapshot_file, source_file):
+        self.snapshot_file = snapshot_file
+        self.source_file = source_file
+
+    def _source_info(self):
+        """来源文件的大小、修改时间和首尾内容的哈希"""
+        stat = os.stat(self.source_file)
+        digest = hashlib.blake2b(digest_size=16)
+        with open(self.source_file, 'rb') as f:
+            digest.update(f.read(self.hash_window))
+            if stat.st_size > self.hash_window:
+                f.seek(max(self.hash_window, stat.st_size - self.hash_window))
+                digest.update(f.read())
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest.hexdigest()}
+
+    def load(self, registry=None):
+        """快照与来源文件一致时返回其中的游戏记录，否则返回None
+
+        给出 registry 时直接按列生成在其中登记编号的 GameRecord（未计算名次），否则返回字典记录。
+        """
+        if not os.path.exists(self.snapshot_file) or not os.path.exists(self.source_file):
+            return None
+        try:
+            with open(self.snapshot_file, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return self._read(mm, registry)
+        except (OSError, ValueError, KeyError, struct.error):
+            # 快照损坏时当作过期处理
+            return None
+
+    def _read(self, mm, registry):
+        header_size = len(self.magic) + 4
+        if mm[:len(self.magic)] != self.magic:
+            return None
+        meta_length, = struct.unpack('<I', mm[len(self.magic):header_size])
+        meta = json.loads(mm[header_size:header_size + meta_length].decode('utf-8'))
+        if (meta['byteorder'] != sys.byteorder or meta['version'] != SCORES_FORMAT_VERSION
+                or meta['source'] != self._source_info()):
+            return None
+
+        data_start = (header_size + meta_length + 7) // 8 * 8
+        data = {}
+        with memoryview(mm) as view:
+            for name, (offset, length) in meta['columns'].items():
+                typecode = self.columns[name]
+                start = data_start + offset
+                with view[start:start + length * array(typecode).itemsize] as column:
+                    with column.cast(typecode) as values:
+                        data[name] = values.tolist()
+
+        names = meta['names']
+        dates = meta['dates']
+        offsets = data['game_offsets']
+        if registry is not None:
+            # 快照中的名称编号一次换算成 registry 的编号，不经过以名称为键的字典
+            ids = [registry.intern(name) for name in names]
+            player_ids = [ids[player_id] for player_id in data['player_ids']]
+            scores = data['scores']
+            return [GameRecord(registry, dates[date_id], player_count,
+                               tuple(player_ids[start:end]), tuple(scores[start:end]), ids[winner_id])
+                    for start, end, player_count, date_id, winner_id in zip(
+                        offsets, offsets[1:], data['player_counts'], data['date_ids'], data['winner_ids'])]
+        score_items = list(zip([names[player_id] for player_id in data['player_ids']], data['scores']))
+        games = []
+        for i, (player_count, date_id, winner_id) in enumerate(
+                zip(data['player_counts'], data['date_ids'], data['winner_ids'])):
+            games.append({
+                'date': dates[date_id],
+                'player_count': player_count,
+                'scores': dict(score_items[offsets[i]:offsets[i + 1]]),
+                'winner': names[winner_id]
+            })
+        return games
+
+    def write(self, games):
+        """根据游戏记录生成快照，分数不是32位整数时不生成"""
+        name_ids = {}
+        date_ids = {}
+        data = {name: array(typecode) for name, typecode in self.columns.items()}
+        data['game_offsets'].append(0)
+        for game in games:
+            for player_name, score in game['scores'].items():
+                if type(score) is not int or not -2 ** 31 <= score < 2 ** 31:
+                    return False
+                data['player_ids'].append(name_ids.setdefault(player_name, len(name_ids)))
+                data['scores'].append(score)
+            data['game_offsets'].append(len(data['player_ids']))
+            data['player_counts'].append(int(game['player_count']))
+            data['date_ids'].append(date_ids.setdefault(game['date'], len(date_ids)))
+            data['winner_ids'].append(name_ids.setdefault(game['winner'], len(name_ids)))
+
+        columns = {}
+        offset = 0
+        for name, values in data.items():
+            columns[name] = [offset, len(values)]
+            offset += (len(values) * values.itemsize + 7) // 8 * 8
+        meta = {
+            'version': SCORES_FORMAT_VERSION,
+            'byteorder': sys.byteorder,
+            'source': self._source_info(),
+            'names': list(name_ids),
+            'dates': list(date_ids),
+            'columns': columns,
+        }
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+        data_start = (len(self.magic) + 4 + len(meta_bytes) + 7) // 8 * 8
+
+        tmp_file = self.snapshot_file + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(self.magic)
+            f.write(struct.pack('<I', len(meta_bytes)))
+            f.write(meta_bytes)
+            for name, values in data.items():
+                f.seek(data_start + columns[name][0])
+                values.tofile(f)
+            f.truncate(data_start + offset)
+        os.replace(tmp_file, self.snapshot_file)
+        return True
+
+class NumpyAnalytics:
+    """基于NumPy的向量化统计
+
+    把历史记录展开为稀疏的 (游戏, 玩家) 分数表：每个参与记录一行，附带参与掩码所需的游戏下标和玩家下标，
+    另有每局的胜者下标和人数向量。所有玩家的统计通过 bincount 等整体归约一次得到，之后的新记录由
+    catch_up 逐局计入，不需要重建。玩家下标即 registry 中的编号。游戏记录需要先经过 rank_game。
+
+    累加顺序与 LeaderboardStats 逐局计入时相同，两者结果一致；但清除玩家后 LeaderboardStats 用减法撤销
+    旧记录，与重建的结果可能相差浮点舍入误差。
+    """
+
+    def __init__(self, registry, games):
+        np = import_numpy()
+        if np is None:
+            raise RuntimeError("向量化统计需要安装 numpy")
+        self.registry = registry
+        # 已计入的记录数（游戏列表的前缀长度）
+        self.applied = len(games)
+        game_index, player_index, scores, rank_percentages = [], [], [], []
+        winner_index, player_counts = [], []
+        for position, game in enumerate(games):
+            game_index.extend([position] * len(game.player_ids))
+            player_index.extend(game.player_ids)
+            scores.extend(game.scores)
+            rank_percentages.extend(game.rank_percentages)
+            winner_index.append(game.winner_id if game.winner_id in game.player_ids else -1)
+            player_counts.append(game.player_count)
+
+        player_total = len(registry)
+        player_index = np.array(player_index, dtype=np.int64)
+        scores = np.array(scores) if scores else np.zeros(0, dtype=np.int64)
+        rank_percentages = np.array(rank_percentages, dtype=np.float64)
+        winner_index = np.array(winner_index, dtype=np.int64)
+        player_counts = np.array(player_counts, dtype=np.int64)
+
+        # 胜者不在参与者中（例如被删除的玩家）时不计胜局
+        has_winner = winner_index >= 0
+        winners = winner_index[has_winner]
+        self.total_games = np.bincount(player_index, minlength=player_total)
+        self.wins = np.bincount(winners, minlength=player_total)
+        self.weighted_wins = np.bincount(winners, weights=player_counts[has_winner], minlength=player_total)
+        self.score_sum = np.bincount(player_index, weights=scores, minlength=player_total)
+        self.rank_percentage_sum = np.bincount(player_index, weights=rank_percentages, minlength=player_total)
+        if np.issubdtype(scores.dtype, np.integer):
+            self.lowest, self.highest = np.iinfo(scores.dtype).min, np.iinfo(scores.dtype).max
+        else:
+            self.lowest, self.highest = -np.inf, np.inf
+        self.max_score = np.full(player_total, self.lowest, dtype=scores.dtype)
+        self.min_score = np.full(player_total, self.highest, dtype=scores.dtype)
+        np.maximum.at(self.max_score, player_index, scores)
+        np.minimum.at(self.min_score, player_index, scores)
+
+    def catch_up(self, games):
+        """按记录顺序逐局计入 games 中尚未计入的新记录"""
+        np = import_numpy()
+        missing = len(self.registry) - len(self.total_games)
+        if missing > 0:
+            # 新登记的玩家
+            def grow(values, fill):
+                return np.concatenate([values, np.full(missing, fill, dtype=values.dtype)])
+            self.total_games = grow(self.total_games, 0)
+            self.wins = grow(self.wins, 0)
+            self.weighted_wins = grow(self.weighted_wins, 0)
+            self.score_sum = grow(self.score_sum, 0)
+            self.rank_percentage_sum = grow(self.rank_percentage_sum, 0)
+            self.max_score = grow(self.max_score, self.lowest)
+            self.min_score = grow(self.min_score, self.highest)
+        for game in games[self.applied:]:
+            for player_id, score, rank_percentage in zip(game.player_ids, game.scores, game.rank_percentages):
+                self.total_games[player_id] += 1
+                self.score_sum[player_id] += score
+                self.rank_percentage_sum[player_id] += rank_percentage
+                self.max_score[player_id] = max(self.max_score[player_id], score)
+                self.min_score[player_id] = min(self.min_score[player_id], score)
+            if game.winner_id in game.player_ids:
+                self.wins[game.winner_id] += 1
+                self.weighted_wins[game.winner_id] += game.player_count
+        self.applied = len(games)
+
+    def _player_id(self, player_name):
+        """玩家的下标，构建之后才登记的玩家返回None"""
+        player_id = self.registry.get(player_name)
+        if player_id is None or player_id >= len(self.total_games):
+            return None
+        return player_id
+
+    def leaderboard(self, player_names):
+        """返回每个玩家的Rating、获胜局数、总局数和平均排名百分比，格式同 LeaderboardStats.leaderboard"""
+        leaderboard = {}
+        for player_name in player_names:
+            player_id = self._player_id(player_name)
+            total_games = int(self.total_games[player_id]) if player_id is not None else 0
+            if total_games:
+                rating = float(self.weighted_wins[player_id]) / total_games
+                wins = int(self.wins[player_id])
+                avg_rank_percentage = float(self.rank_percentage_sum[player_id]) / total_games
+            else:
+                rating, wins, avg_rank_percentage = 0, 0, 0
+            leaderboard[player_name] = {
+                'name': player_name,
+                'rating': rating,
+                'wins': wins,
+                'total_games': total_games,
+                'avg_rank_percentage': avg_rank_percentage
+            }
+        return leaderboard
+
+    def player_summary(self, player_name):
+        """返回玩家的汇总统计，没有记录时返回None"""
+        player_id = self._player_id(player_name)
+        if player_id is None or not self.total_games[player_id]:
+            return None
+        total_games = int(self.total_games[player_id])
+        wins = int(self.wins[player_id])
+        return {
+            'total_games': total_games,
+            'wins': wins,
+            'win_rate': wins / total_games * 100,
+            'avg_score': float(self.score_sum[player_id]) / total_games,
+            'max_score': self.max_score[player_id].item(),
+            'min_score': self.min_score[player_id].item(),
+            'avg_rank_percentage': float(self.rank_percentage_sum[player_id]) / total_games,
+            'rating': float(self.weighted_wins[player_id]) / total_games
+        }
+
+class PlayerGameIndex:
+    """玩家编号到其参加过的游戏位置（在游戏列表中的下标，升序）的倒排索引
+
+    已删除但尚未从记录中清除的玩家记为墓碑（tombstones 中的编号），按玩家查询时视为没有记录。
+    """
+
+    def __init__(self, registry, games=()):
+        self.registry = registry
+        self.positions = defaultdict(list)
+        self.tombstones = set()
+        for position, game in enumerate(games):
+            self.add_game(position, game)
+
+    def add_game(self, position, game):
+        """登记一局新游戏，position 必须大于已登记的位置"""
+        for player_id in game.player_ids:
+            self.positions[player_id].append(position)
+
+    def remove_player(self, player_name):
+        """移除玩家的索引，返回其参加过的游戏位置"""
+        player_id = self.registry.get(player_name)
+        self.tombstones.discard(player_id)
+        return self.positions.pop(player_id, [])
+
+    def tombstone(self, player_name):
+        """把玩家标记为已删除，索引和记录保持不变"""
+        self.tombstones.add(self.registry.intern(player_name))
+
+    def restore(self, player_name):
+        """撤销删除标记"""
+        self.tombstones.discard(self.registry.get(player_name))
+
+    def player_games(self, games, player_name):
+        """按顺序返回玩家参加过的游戏记录，已删除的玩家返回空列表"""
+        player_id = self.registry.get(player_name)
+        if player_id is None or player_id in self.tombstones:
+            return []
+        return [games[position] for position in self.positions.get(player_id, ())]
+
+    def visible_scores(self, game):
+        """游戏中未被删除的玩家的分数，以名称为键"""
+        names = self.registry.names
+        return {names[player_id]: score for player_id, score in zip(game.player_ids, game.scores)
+                if player_id not in self.tombstones}
+
+class CsvGameStore:
+    """游戏记录的CSV存储：新记录追加到日志文件，定期合并进主文件"""
+
+    fieldnames = GAME_FIELDNAMES[SCORES_FORMAT_VERSION]
+    # 日志中累积的记录数达到该值时合并进主文件
+    compact_threshold = 500
+    # 跟随外部追加时，用主文件已读部分开头和结尾的字节数判断文件是否被改写
+    follow_window = 4096
+
+    def __init__(self, games_file):
+        self.games_file = games_file
+        self.journal_file = games_file + ".journal"
+        # 记录主文件编码，下次启动时无需再识别
+        self.encoding_file = games_file + ".encoding"
+        # 主文件的二进制快照，内容未变时启动直接映射读取
+        self.snapshot = GameSnapshot(games_file + ".snapshot", games_file)
+        # 合并过程中使用的临时文件
+        self.tmp_file = games_file + ".tmp"
+        self.merging_file = self.journal_file + ".merging"
+        self.journal_count = 0
+        # 主文件已读入的字节数、已读部分的开头和结尾、表头行，以及读到文件末尾时的 (大小, 修改时间)
+        self.follow_offset = 0
+        self.follow_head = b''
+        self.follow_tail = b''
+        self.follow_header = None
+        self.follow_stat = None
+        # 从主文件读到的外部追加记录 [(序号, 记录)]：在包含它们的整体保存完成之前，每次整体保存都一并写入
+        self.follow_rows = []
+        # 已读到的外部追加记录数，以及其中已由 read_appended 返回的记录数（序号从1开始）
+        self.follow_read = 0
+        self.follow_returned = 0
+        # 整体保存（读取外部追加、写入并替换主文件）和读取外部追加的记录不能同时进行
+        self.follow_lock = threading.Lock()
+
+    def _parse_rows(self, f):
+        """解析CSV中的游戏记录，返回 (记录列表, 格式版本)"""
+        parser = GameCsvParser(f)
+        return list(parser), parser.version
+
+    def _read_encoding(self):
+        """读取缓存的主文件编码"""
+        if os.path.exists(self.encoding_file):
+            with open(self.encoding_file, 'r', encoding='ascii') as f:
+                encoding = f.read().strip()
+            try:
+                return codecs.lookup(encoding).name
+            except LookupError:
+                pass
+        return None
+
+    def _write_encoding(self, encoding):
+        """缓存主文件编码"""
+        with open(self.encoding_file, 'w', encoding='ascii') as f:
+            f.write(encoding)
+
+    def _read_base(self, registry=None):
+        """读取主文件，只读一遍并在读取过程中识别编码；registry 见 load"""
+        if not os.path.exists(self.games_file):
+            self._follow_from(0)
+            return [], SCORES_FORMAT_VERSION
+        # 快照有效说明主文件的大小与生成快照时相同
+        size = os.path.getsize(self.games_file)
+        games = self.snapshot.load(registry)
+        if games is not None:
+            self._follow_from(size)
+            return games, SCORES_FORMAT_VERSION
+        cached_encoding = self._read_encoding()
+        with open(self.games_file, 'rb') as f:
+            decoder = StreamDecoder(f, cached_encoding)
+            games, version = self._parse_rows(decoder)
+            self._follow_from(f.tell())
+        if decoder.encoding and decoder.encoding != cached_encoding:
+            try:
+                self._write_encoding(decoder.encoding)
+            except OSError:
+                pass
+        if version == SCORES_FORMAT_VERSION:
+            # 快照过期或不存在，重新生成
+            self._write_snapshot(games)
+        return games, version
+
+    def _follow_from(self, size):
+        """记下主文件的前 size 字节已经读入，之后 read_appended 只读取此后追加的部分"""
+        self.follow_offset = size
+        self.follow_head = self.follow_tail = b''
+        self.follow_header = None
+        self.follow_stat = None
+        if size == 0:
+            return
+        window = min(size, self.follow_window)
+        with open(self.games_file, 'rb') as f:
+            self.follow_head = f.read(window)
+            f.seek(size - window)
+            self.follow_tail = f.read(window)
+            stat = os.fstat(f.fileno())
+        if b'\n' in self.follow_head:
+            self.follow_header = self.follow_head.split(b'\n', 1)[0].decode('utf-8-sig', errors='replace') + '\n'
+        # 文件在读入之后又被追加时不记录，下次检查时直接读取
+        if stat.st_size == size:
+            self.follow_stat = (stat.st_size, stat.st_mtime_ns)
+
+    def read_appended(self):
+        """读取其他程序追加到主文件末尾的完整行
+
+        返回新记录列表，没有新的完整行时为空列表（写到一半的行留到下次读取）；
+        文件被截短或改写时返回None，需要重新加载全部记录。正在整体保存时跳过本次检查。
+        """
+        if not self.follow_lock.acquire(blocking=False):
+            return []
+        try:
+            games = self._read_appended()
+            if games is None:
+                # 需要重新加载全部记录，已读到的记录都会重新读入
+                self.follow_rows = []
+                self.follow_returned = self.follow_read
+                return None
+            self._remember_appended(games)
+            games = [game for serial, game in self.follow_rows if serial > self.follow_returned]
+            self.follow_returned = self.follow_read
+            return games
+        finally:
+            self.follow_lock.release()
+
+    def follow_mark(self):
+        """已由 read_appended 返回的外部追加记录数
+
+        取记录快照时一并记下，整体保存时传给 save：此后返回的记录不在快照中，由 save 补写。
+        """
+        return self.follow_returned
+
+    def _remember_appended(self, games):
+        for game in games:
+            self.follow_read += 1
+            self.follow_rows.append((self.follow_read, game))
+
+    def _read_appended(self):
+        """read_appended 的读取部分，调用时持有 follow_lock"""
+        try:
+            stat = os.stat(self.games_file)
+        except FileNotFoundError:
+            return [] if self.follow_offset == 0 else None
+        if (stat.st_size, stat.st_mtime_ns) == self.follow_stat:
+            return []
+        if stat.st_size < self.follow_offset:
+            return None
+        with open(self.games_file, 'rb') as f:
+            if f.read(len(self.follow_head)) != self.follow_head:
+                return None
+            f.seek(self.follow_offset - len(self.follow_tail))
+            if f.read(len(self.follow_tail)) != self.follow_tail:
+                return None
+            data = f.read(stat.st_size - self.follow_offset)
+        if not data:
+            # 大小不变但修改时间变了，视为原地改写
+            return None
+        cut = data.rfind(b'\n') + 1
+        if not cut:
+            return []
+        lines = iter(StreamDecoder(io.BytesIO(data[:cut]), self._read_encoding()))
+        if self.follow_header is not None:
+            lines = chain([self.follow_header], lines)
+        parser = GameCsvParser(lines)
+        games = []
+        for row in parser.reader:
+            if not row:
+                continue
+            try:
+                games.append(parser.parse_row(row))
+            except Exception:
+                # 与读取日志时一样跳过无法解析的行
+                instrumentation.count('read_appended.bad_row')
+        self._follow_from(self.follow_offset + cut)
+        return games
+
+    def _write_snapshot(self, games):
+        """生成主文件快照，失败时不影响正常读写"""
+        try:
+            self.snapshot.write(games)
+        except OSError:
+            pass
+
+    def _read_journal(self):
+        """读取日志文件，忽略写入中途被打断的最后一行
+
+        每条记录追加时都以换行结束：没有换行结尾、或者无法解析的最后一行是写入中途被打断的，
+        从文件中去掉；中间无法解析的行跳过，但保留在文件中。
+        """
+        if not os.path.exists(self.journal_file):
+            return [], SCORES_FORMAT_VERSION
+        with open(self.journal_file, 'rb') as f:
+            data = f.read()
+        # 完整的部分：到最后一个换行为止
+        keep = data[:data.rfind(b'\n') + 1]
+        parser = GameCsvParser(io.StringIO(keep.decode('utf-8', errors='replace'), newline=''))
+        rows = [row for row in parser.reader if row]
+        games = []
+        for i, row in enumerate(rows):
+            try:
+                games.append(parser.parse_row(row))
+            except Exception:
+                if i < len(rows) - 1:
+                    instrumentation.count('journal.bad_row')
+                    continue
+                # 最后一行虽有换行但内容不完整，同样去掉
+                keep = keep[:keep.rstrip(b'\r\n').rfind(b'\n') + 1]
+        if len(keep) < len(data) and parser.version == SCORES_FORMAT_VERSION:
+            # 去掉不完整的行，避免之后追加的记录接在它后面；先写临时文件再替换，中途退出时原日志不受影响
+            tmp_file = self.journal_file + ".tmp"
+            with open(tmp_file, 'wb') as f:
+                f.write(keep)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.journal_file)
+        return games, parser.version
+
+    def _recover(self):
+        """处理上次合并中途退出时留下的文件"""
+        if os.path.exists(self.merging_file):
+            # 日志已移走：临时文件还在说明主文件尚未替换，它已完整写入，直接完成替换
+            if os.path.exists(self.tmp_file):
+                os.replace(self.tmp_file, self.games_file)
+            os.remove(self.merging_file)
+        elif os.path.exists(self.tmp_file):
+            # 合并还没开始，主文件和日志都完好，丢弃临时文件即可
+            os.remove(self.tmp_file)
+
+    def _row(self, game):
+        """把游戏记录转换为CSV行"""
+        return {
+            'date': game['date'],
+            'player_count': game['player_count'],
+            'scores_json': json.dumps(game['scores'], ensure_ascii=False),
+            'winner': game['winner']
+        }
+
+    def load(self, registry=None):
+        """加载主文件和日志中的全部记录
+
+        给出 registry 时，从快照读取的部分直接返回在其中登记编号的 GameRecord，其余为字典记录。
+        """
+        self._recover()
+        self.follow_rows = []
+        self.follow_read = self.follow_returned = 0
+        games, version = self._read_base(registry)
+        journal_games, journal_version = self._read_journal()
+        self.journal_count = len(journal_games)
+        games += journal_games
+        if min(version, journal_version) < SCORES_FORMAT_VERSION:
+            # 旧格式文件只读取一次，立即改写为当前格式
+            try:
+                self.save(games)
+            except OSError:
+                pass
+        return games
+
+    def append(self, game):
+        """把一条新记录追加到日志文件"""
+        write_header = not os.path.exists(self.journal_file) or os.path.getsize(self.journal_file) == 0
+        with open(self.journal_file, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+            if write_header:
+                writer.writeheader()
+            writer.writerow(self._row(game))
+            f.flush()
+            os.fsync(f.fileno())
+        self.journal_count += 1
+
+    def needs_compaction(self):
+        """日志是否已经长到需要合并"""
+        return self.journal_count >= self.compact_threshold
+
+    def save(self, games, follow_mark=None):
+        """把全部记录写入主文件并清空日志，主文件通过原子重命名替换
+
+        follow_mark 为取 games 快照时的 follow_mark()，默认为当前值，即 games 已包含 read_appended
+        返回过的全部记录。其他程序追加到主文件、但不在 games 中的记录不会被覆盖：
+        快照之后才由 read_appended 返回的，以及尚未返回的（由下一次 read_appended 返回），都写在 games 之后。
+        """
+        with self.follow_lock:
+            appended = self._read_appended()
+            if appended:
+                self._remember_appended(appended)
+            if follow_mark is None:
+                follow_mark = self.follow_returned
+            games = list(games) + [game for serial, game in self.follow_rows if serial > follow_mark]
+            with open(self.tmp_file, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+                writer.writeheader()
+                for game in games:
+                    writer.writerow(self._row(game))
+                f.flush()
+                os.fsync(f.fileno())
+            # 先移走日志再替换主文件，中途退出时由 _recover 收尾
+            if os.path.exists(self.journal_file):
+                os.replace(self.journal_file, self.merging_file)
+            os.replace(self.tmp_file, self.games_file)
+            self._follow_from(os.path.getsize(self.games_file))
+            # 快照中已有的记录之后由快照本身写入，不再补写
+            self.follow_rows = [(serial, game) for serial, game in self.follow_rows if serial > follow_mark]
+        if os.path.exists(self.merging_file):
+            os.remove(self.merging_file)
+        self._write_encoding('utf-8')
+        self._write_snapshot(games)
+        self.journal_count = 0
+
+class CsvStorage:
+    """基于 players.csv / games.csv 的存储"""
+
+    def __init__(self, players_file="players.csv", games_file="games.csv"):
+        self.players_file = players_file
+        self.games_file = games_file
+        self.game_store = CsvGameStore(games_file)
+        # 已删除、尚未从游戏记录中清除的玩家
+        self.deleted_file = players_file + ".deleted"
+
+    def load_players(self):
+        """加载玩家数据"""
+        players = []
+        if os.path.exists(self.players_file):
+            with open(self.players_file, 'r', newline='', encoding='utf-8') as f:
+                reader = csv.DictReader(f)
+                for row in reader:
+                    players.append(row)
+        return players
+
+    def save_players(self, players):
+        """保存玩家数据"""
+        with open(self.players_file, 'w', newline='', encoding='utf-8') as f:
+            fieldnames = ['id', 'name']
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            for player in players:
+                player_data = {'id': player['id'], 'name': player['name']}
+                writer.writerow(player_data)
+
+    def load_deleted_players(self):
+        """加载已删除、尚未从游戏记录中清除的玩家（id、name 和删除前在玩家列表中的位置 position）"""
+        players = []
+        if os.path.exists(self.deleted_file):
+            with open(self.deleted_file, 'r', newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    players.append(row)
+        return players
+
+    def save_deleted_players(self, players):
+        """保存已删除的玩家，先写临时文件再替换；没有时删除文件"""
+        if not players:
+            if os.path.exists(self.deleted_file):
+                os.remove(self.deleted_file)
+            return
+        tmp_file = self.deleted_file + ".tmp"
+        with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['id', 'name', 'position'])
+            writer.writeheader()
+            for player in players:
+                writer.writerow({'id': player['id'], 'name': player['name'], 'position': player['position']})
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.deleted_file)
+
+    def load_games(self, registry=None):
+        """加载游戏数据；给出 registry 时部分记录可能直接是 GameRecord，见 CsvGameStore.load"""
+        return self.game_store.load(registry)
+
+    def save_games(self, games, appended_mark=None):
+        """保存游戏数据（整体重写并合并日志）；appended_mark 见 appended_mark()"""
+        self.game_store.save(games, appended_mark)
+
+    def append_game(self, game, games, appended_mark=None):
+        """把新记录追加到日志，日志过长时合并进主文件"""
+        self.game_store.append(game)
+        if self.game_store.needs_compaction():
+            self.game_store.save(games, appended_mark)
+
+    def remove_player_games(self, player_names, games, appended_mark=None):
+        """从游戏记录中清除玩家：CSV无法只改动部分行，整体写入清除后的全部记录 games"""
+        self.game_store.save(games, appended_mark)
+
+    def read_appended_games(self):
+        """其他程序追加到 games.csv 的新记录，文件被截短或改写时返回None"""
+        return self.game_store.read_appended()
+
+    def appended_mark(self):
+        """取记录快照时记下，保存快照时传回：快照之后才读入的外部追加记录由保存时补写"""
+        return self.game_store.follow_mark()
+
+class SqliteStorage:
+    """基于SQLite的存储，游戏和参与记录分表保存
+
+    查询都在内存中完成，数据库只按玩家建立索引，供清除玩家时只改动其参加过的游戏。
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS players (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS deleted_players (
+            id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            position INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS games (
+            id INTEGER PRIMARY KEY,
+            date TEXT NOT NULL,
+            player_count INTEGER NOT NULL,
+            winner TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS participations (
+            game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+            seat INTEGER NOT NULL,
+            player TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            PRIMARY KEY (game_id, seat)
+        );
+        CREATE INDEX IF NOT EXISTS idx_participations_player ON participations(player, game_id);
+        DROP INDEX IF EXISTS idx_games_date;
+        DROP INDEX IF EXISTS idx_games_player_count;
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        # 写入在界面的后台线程中按顺序执行，允许跨线程使用同一连接
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(self.schema)
+
+    def close(self):
+        self.conn.close()
+
+    def load_players(self):
+        """加载玩家数据"""
+        rows = self.conn.execute("SELECT id, name FROM players ORDER BY rowid")
+        return [{'id': player_id, 'name': name} for player_id, name in rows]
+
+    def save_players(self, players):
+        """保存玩家数据"""
+        with self.conn:
+            self.conn.execute("DELETE FROM players")
+            self.conn.executemany("INSERT INTO players (id, name) VALUES (?, ?)",
+                                  [(player['id'], player['name']) for player in players])
+
+    def load_deleted_players(self):
+        """加载已删除、尚未从游戏记录中清除的玩家"""
+        rows = self.conn.execute("SELECT id, name, position FROM deleted_players ORDER BY rowid")
+        return [{'id': player_id, 'name': name, 'position': position} for player_id, name, position in rows]
+
+    def save_deleted_players(self, players):
+        """保存已删除的玩家"""
+        with self.conn:
+            self.conn.execute("DELETE FROM deleted_players")
+            self.conn.executemany("INSERT INTO deleted_players (id, name, position) VALUES (?, ?, ?)",
+                                  [(player['id'], player['name'], int(player['position'])) for player in players])
+
+    def _rows_to_games(self, rows):
+        """把按 (游戏id, 座位) 排序的联表结果组装成游戏记录"""
+        games = []
+        last_game_id = None
+        for game_id, date, player_count, winner, player, score in rows:
+            if game_id != last_game_id:
+                last_game_id = game_id
+                games.append({'date': date, 'player_count': player_count, 'scores': {}, 'winner': winner})
+            if player is not None:
+                games[-1]['scores'][player] = score
+        return games
+
+    def load_games(self, registry=None):
+        """加载游戏数据，总是返回字典记录"""
+        rows = self.conn.execute("""
+            SELECT g.id, g.date, g.player_count, g.winner, p.player, p.score
+            FROM games g LEFT JOIN participations p ON p.game_id = g.id
+            ORDER BY g.id, p.seat
+        """)
+        return self._rows_to_games(rows)
+
+    def _insert_game(self, game):
+        cursor = self.conn.execute("INSERT INTO games (date, player_count, winner) VALUES (?, ?, ?)",
+                                   (game['date'], int(game['player_count']), game['winner']))
+        self.conn.executemany("INSERT INTO participations (game_id, seat, player, score) VALUES (?, ?, ?, ?)",
+                              [(cursor.lastrowid, seat, player, score)
+                               for seat, (player, score) in enumerate(game['scores'].items())])
+
+    def save_games(self, games, appended_mark=None):
+        """保存游戏数据（整体重写）"""
+        with self.conn:
+            self.conn.execute("DELETE FROM participations")
+            self.conn.execute("DELETE FROM games")
+            for game in games:
+                self._insert_game(game)
+
+    def append_game(self, game, games, appended_mark=None):
+        """插入一条新记录"""
+        with self.conn:
+            self._insert_game(game)
+
+    def remove_player_games(self, player_names, games, appended_mark=None):
+        """从游戏记录中清除玩家：按玩家索引只改动其参加过的游戏，胜者是该玩家时改为剩余得分最高的玩家"""
+        with self.conn:
+            for player_name in player_names:
+                self.conn.execute("""
+                    UPDATE games SET winner = COALESCE((
+                        SELECT p.player FROM participations p
+                        WHERE p.game_id = games.id AND p.player != :player
+                        ORDER BY p.score DESC, p.seat LIMIT 1), '无')
+                    WHERE winner = :player AND id IN (SELECT game_id FROM participations WHERE player = :player)
+                """, {'player': player_name})
+                self.conn.execute("DELETE FROM participations WHERE player = ?", (player_name,))
+
+    def read_appended_games(self):
+        """数据库只由本程序写入，不跟随外部追加的记录"""
+        return []
+
+    def appended_mark(self):
+        """数据库不跟随外部追加，保存时没有需要补写的记录"""
+        return 0
+
+def migrate_csv_to_sqlite(db_file, players_file="players.csv", games_file="games.csv"):
+    """把CSV中的玩家和游戏记录导入SQLite数据库"""
+    source = CsvStorage(players_file, games_file)
+    target = SqliteStorage(db_file)
+    try:
+        players = source.load_players()
+        games = source.load_games()
+        target.save_players(players)
+        target.save_games(games)
+        target.save_deleted_players(source.load_deleted_players())
+    finally:
+        target.close()
+    return len(players), len(games)
+
+class MemoCache:
+    """按数据版本失效、容量有限的LRU缓存，并统计命中和未命中次数
+
+    generation 返回当前的数据版本号，版本号变大后第一次访问时清空全部条目。
+    界面线程和后台线程都会使用，读写条目时持有锁，计算时不持有；计算期间数据有变化时结果不保存。
+    """
+
+    def __init__(self, max_size, generation):
+        self.max_size = max_size
+        self.generation = generation
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        # 当前条目对应的数据版本号
+        self.entries_generation = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        """返回 key 在当前数据上的结果，没有缓存时调用 compute 计算并保存"""
+        generation = self.generation()
+        with self.lock:
+            if self.entries_generation is None or generation > self.entries_generation:
+                self.entries.clear()
+                self.entries_generation = generation
+            elif generation == self.entries_generation and key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        value = compute()
+        with self.lock:
+            if generation == self.entries_generation == self.generation():
+                self.entries[key] = value
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """丢弃全部条目"""
+        with self.lock:
+            self.entries.clear()
+
+    def reset_counts(self):
+        """命中和未命中次数清零"""
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+class ScoreData:
+    """玩家和游戏记录及其统计数据，不依赖界面，图形界面和批处理共用"""
+    
+    # 按玩家缓存的Rating、平均排名百分比和报告，以及排行榜的缓存条目数
+    stats_cache_size = 256
+    # bootstrap置信区间的重抽样次数（0为不计算）、随机种子、置信水平和进程数（None为CPU核数）
+    bootstrap_resamples = 1000
+    bootstrap_seed = 0
+    bootstrap_confidence = 0.95
+    bootstrap_workers = None
+    # 每个进程池任务的重抽样次数，一名玩家的重抽样也分成多块并行计算
+    bootstrap_chunk_size = 250
+    # 全部任务的计算量（见 bootstrap_cost）之和小于该值时直接在当前进程计算，省去启动进程池的开销
+    bootstrap_pool_threshold = 100000
+    
+    def __init__(self, storage=None, tie_rule='competition', analytics='python'):
+        # 数据存储，默认使用 players.csv / games.csv
+        self.storage = storage or CsvStorage()
+        # 同分名次规则，见 TIE_RULES
+        self.tie_rule = tie_rule
+        # 统计引擎：python 使用增量累计的 LeaderboardStats，numpy 使用 NumpyAnalytics
+        self.analytics = analytics
+        # 数据版本号，每次新增或修改记录时加一，用于判断缓存是否过期
+        self.data_version = 0
+        # 按 (种类, 玩家或范围) 缓存的统计结果，数据版本号变化后失效
+        self.stats_cache = MemoCache(self.stats_cache_size, lambda: self.data_version)
+        # 向量化统计引擎，与Elo评分一样在第一次使用时构建、随新记录增量更新，记录被修改时 generation 加一
+        self._numpy = None
+        self._numpy_generation = 0
+        # 已删除、尚未从记录中清除的玩家：名称 -> (在玩家列表中的位置, 玩家)，按删除顺序排列；
+        # 保存在存储中，重新启动后仍保持删除状态，直到清除
+        self.deleted_players = OrderedDict()
+        # Elo评分在第一次使用时计算，之后随新记录增量更新；记录被修改时 generation 加一，正在进行的计算作废
+        self._elo = None
+        self._elo_generation = 0
+        self._elo_lock = threading.Lock()
+        # 记录被重新加载或清除玩家时加一，正在后台准备的清除（prepare_compaction）作废
+        self._records_generation = 0
+        # 记录列表、统计和索引的锁：界面线程修改时持有，后台线程读取统计和索引、复制记录列表时持有
+        self._data_lock = threading.RLock()
+        
+        # 初始化数据
+        self.load_data()
+        for player in self.load_deleted_players():
+            self.deleted_players[player['name']] = (int(player['position']),
+                                                    {'id': player['id'], 'name': player['name']})
+        self.hide_deleted_players()
+    
+    def load_data(self):
+        """从存储加载玩家和游戏记录，建立统计和索引"""
+        with self._data_lock:
+            self._load_data()
+    
+    def _load_data(self):
+        self.players = self.load_players()
+        # 玩家名称 -> 编号，先按玩家列表的顺序登记
+        self.registry = PlayerRegistry(player['name'] for player in self.players)
+        # 内存中保存紧凑的 GameRecord，每局的名次只在加载和新增时计算一次
+        # 从快照读取的记录已经是 GameRecord，其余由字典转换
+        self.games = [rank_game(game if isinstance(game, GameRecord) else GameRecord.from_dict(game, self.registry),
+                                self.tie_rule)
+                      for game in self.load_games()]
+        # 按玩家累计的统计数据，随记录增删增量更新
+        self.stats = LeaderboardStats(self.registry, self.games)
+        # 玩家 -> 游戏位置的索引，按玩家查询时不再遍历全部记录
+        self.player_index = PlayerGameIndex(self.registry, self.games)
+        # 最近N局/N天、按月/季度的排行榜统计
+        self.rolling = RollingLeaderboards(self.registry, self.games)
+        # 两两交锋统计
+        self.head_to_head = HeadToHead(self.registry, self.games)
+        with self._elo_lock:
+            self._elo = None
+            self._elo_generation += 1
+        self._numpy = None
+        self._numpy_generation += 1
+        self._records_generation += 1
+    
+    def reload(self):
+        """重新加载全部数据（例如数据文件被其他程序改写后），尚未清除的已删除玩家仍保持删除状态"""
+        with self._data_lock:
+            self.load_data()
+            self.hide_deleted_players()
+            self.data_version += 1
+    
+    def hide_deleted_players(self):
+        """从玩家列表中移出已删除的玩家，并在索引中记墓碑"""
+        with self._data_lock:
+            for player_name in self.deleted_players:
+                self.players = [player for player in self.players if player['name'] != player_name]
+                self.player_index.tombstone(player_name)
+    
+    @instrumented
+    def load_players(self):
+        """加载玩家数据"""
+        return self.storage.load_players()
+    
+    @instrumented
+    def save_players(self, players=None):
+        """保存玩家数据；players 为要写入的玩家列表（例如提交后台任务时的快照），默认为当前玩家"""
+        self.storage.save_players(self.players if players is None else players)
+    
+    @instrumented
+    def load_deleted_players(self):
+        """加载已删除、尚未清除的玩家"""
+        return self.storage.load_deleted_players()
+    
+    def deleted_player_rows(self):
+        """deleted_players 转换为存储使用的行"""
+        return [{'id': player['id'], 'name': player_name, 'position': position}
+                for player_name, (position, player) in self.deleted_players.items()]
+    
+    @instrumented
+    def save_deleted_players(self, rows=None):
+        """保存已删除、尚未清除的玩家；rows 为 deleted_player_rows 的快照，默认为当前"""
+        self.storage.save_deleted_players(self.deleted_player_rows() if rows is None else rows)
+    
+    @instrumented
+    def load_games(self):
+        """加载游戏数据，名称登记到当前的 registry 中"""
+        return self.storage.load_games(self.registry)
+    
+    @instrumented
+    def save_games(self, games=None, appended_mark=None):
+        """保存游戏数据；games 为要写入的全部记录（例如提交后台任务时的快照，appended_mark 为同时取得的
+        storage.appended_mark()），默认为当前记录
+
+        记录不会被修改，写入期间不持有数据锁。
+        """
+        self.storage.save_games(self.games if games is None else games, appended_mark)
+    
+    @instrumented
+    def append_game(self, game, games=None, appended_mark=None):
+        """保存一条新记录，不重写已有数据；games 为包含该记录在内的全部记录，存储需要合并时写入"""
+        self.storage.append_game(game, self.games if games is None else games, appended_mark)
+    
+    @instrumented
+    def remove_player_games(self, player_names, games=None, appended_mark=None):
+        """从存储的游戏记录中清除玩家；games 为清除后的全部记录（存储需要整体重写时写入），默认为当前记录"""
+        self.storage.remove_player_games(player_names, self.games if games is None else games, appended_mark)
+    
+    def add_game(self, game):
+        """把一局新游戏（字典记录）加入内存数据：计算名次并增量更新统计和索引，返回内存中的 GameRecord"""
+        with self._data_lock:
+            game = rank_game(GameRecord.from_dict(game, self.registry), self.tie_rule)
+            self.games.append(game)
+            self.stats.add_game(game)
+            self.head_to_head.add_game(game)
+            self.player_index.add_game(len(self.games) - 1, game)
+            self.rolling.add_game(len(self.games) - 1, game)
+            with self._elo_lock:
+                if self._elo is not None:
+                    self._elo.catch_up(self.games)
+            if self._numpy is not None:
+                self._numpy.catch_up(self.games)
+            self.data_version += 1
+        return game
+    
+    @instrumented
+    def calculate_avg_rank_percentage(self, player_name):
+        """计算玩家的平均排名百分比"""
+        return self.stats_cache.get(('avg_rank_percentage', player_name),
+                                    lambda: self.stats.avg_rank_percentage(player_name))
+    
+    @instrumented
+    def calculate_rating(self, player_name):
+        """计算玩家的rating"""
+        return self.stats_cache.get(('rating', player_name), lambda: self.stats.rating(player_name))
+    
+    def numpy_analytics(self):
+        """返回向量化统计引擎，第一次使用或记录被修改后从全部记录构建（可能在后台线程中）
+
+        引擎随新记录在界面线程中更新，读取其结果时需要持有数据锁。
+        """
+        with self._data_lock:
+            if self._numpy is not None:
+                return self._numpy
+            generation = self._numpy_generation
+            games = list(self.games)
+        # 构建期间不持有锁
+        engine = NumpyAnalytics(self.registry, games)
+        with self._data_lock:
+            if generation == self._numpy_generation:
+                # 补上构建期间新增的记录
+                engine.catch_up(self.games)
+                self._numpy = engine
+        return engine
+    
+    @instrumented
+    def elo_ratings(self):
+        """返回Elo评分，第一次使用或需要重新计算时从全部记录计算（可能在后台线程中）"""
+        with self._elo_lock:
+            if self._elo is not None and not self._elo.stale:
+                return self._elo
+            generation = self._elo_generation
+            games = list(self.games)
+        # 计算期间不持有锁（记录不会被修改），界面线程可以继续保存新记录
+        elo = EloRatings(self.registry, games)
+        with self._elo_lock:
+            if generation == self._elo_generation:
+                # 补上计算期间新增的记录
+                elo.catch_up(self.games)
+                self._elo = elo
+        return elo
+    
+    @instrumented
+    def compute_leaderboard(self, window=None):
+        """计算所有玩家的排行榜数据；window 为 (种类, 参数) 时只统计该范围内的对局，且只包含有对局的玩家
+
+        每个玩家另附当前的Elo评分（elo），它总是按全部记录计算。
+        """
+        with self._data_lock:
+            player_names = [player['name'] for player in self.players]
+            if window is not None:
+                with self.rolling.lock:
+                    leaderboard = self.rolling.stats(*window).leaderboard(player_names)
+                leaderboard = {name: data for name, data in leaderboard.items() if data['total_games']}
+            elif self.analytics != 'numpy':
+                # 直接读取累计统计数据
+                leaderboard = self.stats.leaderboard(player_names)
+        if window is None and self.analytics == 'numpy':
+            engine = self.numpy_analytics()
+            with self._data_lock:
+                leaderboard = engine.leaderboard(player_names)
+        # Elo评分和向量化引擎在数据锁之外计算
+        elo = self.elo_ratings()
+        for name, data in leaderboard.items():
+            data['elo'] = elo.rating(name)[0]
+        return leaderboard
+    
+    def cached_leaderboard(self, window=None):
+        """带缓存的 compute_leaderboard，数据没有变化时直接返回上次的结果（与缓存共用，不能修改）"""
+        key = ('leaderboard', window)
+        if window is not None and window[0] == 'days':
+            # 最近N天的范围随日期推移
+            key += (datetime.now().strftime("%Y-%m-%d"),)
+        return self.stats_cache.get(key, lambda: self.compute_leaderboard(window))
+    
+    def player_summary(self, player_name):
+        """返回玩家的汇总统计，没有记录时返回None"""
+        if self.analytics == 'numpy':
+            engine = self.numpy_analytics()
+            with self._data_lock:
+                return engine.player_summary(player_name)
+        player_id = self.registry.get(player_name)
+        scores = [game.scores[game.seat(player_id)]
+                  for game in self.player_index.player_games(self.games, player_name)]
+        if not scores:
+            return None
+        total_games = len(scores)
+        rating, _, wins = self.calculate_rating(player_name)
+        avg_rank_percentage, _ = self.calculate_avg_rank_percentage(player_name)
+        return {
+            'total_games': total_games,
+            'wins': wins,
+            'win_rate': wins / total_games * 100,
+            'avg_score': sum(scores) / total_games,
+            'max_score': max(scores),
+            'min_score': min(scores),
+            'avg_rank_percentage': avg_rank_percentage,
+            'rating': rating
+        }
+    
+    def bootstrap_job(self, player_name):
+        """玩家的bootstrap任务（见 bootstrap_tasks），没有记录或不计算置信区间时返回None
+
+        任务中是数据的副本，重抽样期间不持有数据锁。
+        """
+        with self._data_lock:
+            player_games = self.player_index.player_games(self.games, player_name)
+            if not player_games or self.bootstrap_resamples <= 0:
+                return None
+            player_id = self.registry.get(player_name)
+            frequencies = defaultdict(int)
+            for game in player_games:
+                weighted_win = game.player_count if game.winner_id == player_id else 0
+                frequencies[(weighted_win, game.rank_percentages[game.seat(player_id)])] += 1
+        return (player_name, list(frequencies), list(frequencies.values()),
+                self.bootstrap_resamples, self.bootstrap_seed, self.bootstrap_confidence)
+    
+    def bootstrap_key(self):
+        """置信区间缓存键中的参数部分"""
+        return (self.bootstrap_resamples, self.bootstrap_seed, self.bootstrap_confidence)
+    
+    def confidence_interval(self, player_name):
+        """玩家的Rating和平均排名百分比的置信区间，没有记录时返回None；缓存到数据变化为止"""
+        return self.stats_cache.get(('confidence_interval', player_name, self.bootstrap_key()),
+                                    lambda: self.compute_confidence_intervals([player_name]).get(player_name))
+    
+    @instrumented
+    def compute_confidence_intervals(self, player_names):
+        """用进程池并行计算各玩家的置信区间，返回 {玩家: 置信区间}，没有记录的玩家不包含在内
+
+        每名玩家的重抽样按 bootstrap_chunk_size 分块，计算量小于 bootstrap_pool_threshold 时直接在当前进程计算，
+        两种方式的结果相同。
+        """
+        with self._data_lock:
+            jobs = [job for job in map(self.bootstrap_job, player_names) if job is not None]
+        tasks = [task for job in jobs for task in bootstrap_tasks(job, self.bootstrap_chunk_size)]
+        if sum(map(bootstrap_cost, tasks)) >= self.bootstrap_pool_threshold:
+            with ProcessPoolExecutor(max_workers=self.bootstrap_workers) as pool:
+                results = list(pool.map(bootstrap_resample, tasks))
+        else:
+            results = list(map(bootstrap_resample, tasks))
+        resampled = {}
+        for player_name, ratings, averages in results:
+            player_ratings, player_averages = resampled.setdefault(player_name, ([], []))
+            player_ratings.extend(ratings)
+            player_averages.extend(averages)
+        return {player_name: bootstrap_intervals(player_name, ratings, averages, self.bootstrap_confidence)
+                for player_name, (ratings, averages) in resampled.items()}
+    
+    def confidence_intervals(self):
+        """全部玩家的置信区间，缓存到数据变化为止（与缓存共用，不能修改）
+
+        各玩家的结果同时存为 confidence_interval 的缓存，之后生成报告时不再重新计算。
+        """
+        with self._data_lock:
+            player_names = [player['name'] for player in self.players]
+        key = self.bootstrap_key()
+        
+        def compute():
+            data_version = self.data_version
+            intervals = self.compute_confidence_intervals(player_names)
+            with self._data_lock:
+                if self.data_version == data_version:
+                    for player_name in player_names:
+                        self.stats_cache.get(('confidence_interval', player_name, key),
+                                             lambda: intervals.get(player_name))
+            return intervals
+        return self.stats_cache.get(('confidence_intervals', key), compute)
+    
+    def delete_player(self, player_name):
+        """删除玩家：只从玩家列表中移出并在索引中记墓碑，游戏记录留到 compact_players 时再处理
+
+        清除之前其他玩家的名次和胜局仍包含该玩家参加的对局。
+        """
+        with self._data_lock:
+            for position, player in enumerate(self.players):
+                if player['name'] == player_name:
+                    del self.players[position]
+                    self.deleted_players[player_name] = (position, player)
+                    self.player_index.tombstone(player_name)
+                    self.data_version += 1
+                    return player
+        return None
+    
+    def undo_delete_player(self):
+        """恢复最近删除且尚未清除的玩家，返回玩家名称，没有可恢复的玩家时返回None"""
+        if not self.deleted_players:
+            return None
+        with self._data_lock:
+            player_name, (position, player) = self.deleted_players.popitem()
+            self.players.insert(min(position, len(self.players)), player)
+            self.player_index.restore(player_name)
+            self.data_version += 1
+        return player_name
+    
+    def compact_players(self):
+        """从游戏记录中清除所有已删除的玩家，返回被清除的玩家名称列表"""
+        with self._data_lock:
+            player_names = list(self.deleted_players)
+            for player_name in player_names:
+                _, player = self.deleted_players.pop(player_name)
+                self.remove_player(player['id'], player_name)
+        return player_names
+    
+    def prepare_compaction(self, player_names):
+        """清除已删除玩家的耗时部分，可在后台线程执行，不修改数据
+
+        在记录快照上为这些玩家参加过的游戏生成清除后的新记录，并由新记录构建统计和交锋统计，
+        返回交给 apply_compaction 的结果。
+        """
+        with self._data_lock:
+            generation = self._records_generation
+            games = list(self.games)
+            removed = [(player_name, self.registry.get(player_name)) for player_name in player_names]
+            positions = [list(self.player_index.positions.get(player_id, ())) for _, player_id in removed]
+        # 记录不会被修改，生成新记录和构建统计期间不持有锁
+        for (_, player_id), player_positions in zip(removed, positions):
+            for position in player_positions:
+                games[position] = self._without_player(games[position], player_id)
+        return generation, removed, games, LeaderboardStats(self.registry, games), HeadToHead(self.registry, games)
+    
+    def apply_compaction(self, compaction):
+        """把 prepare_compaction 的结果换入内存数据，返回被清除的玩家名称列表
+
+        准备期间数据被重新加载、或其中的玩家被撤销删除时不做修改，返回None。
+        """
+        generation, removed, games, stats, head_to_head = compaction
+        with self._data_lock:
+            if (generation != self._records_generation
+                    or any(player_name not in self.deleted_players for player_name, _ in removed)):
+                return None
+            # 补上准备期间新增的记录，跟随模式读入的外部记录可能包含被清除的玩家
+            for game in self.games[len(games):]:
+                for _, player_id in removed:
+                    if game.seat(player_id) is not None:
+                        game = self._without_player(game, player_id)
+                games.append(game)
+                stats.add_game(game)
+                head_to_head.add_game(game)
+            # 原地替换，滚动排行榜等持有列表本身的引用
+            self.games[:] = games
+            self.stats = stats
+            self.head_to_head = head_to_head
+            for player_name, _ in removed:
+                _, player = self.deleted_players.pop(player_name)
+                self.players = [p for p in self.players if p['id'] != player['id']]
+                self.player_index.remove_player(player_name)
+            self._invalidate_records()
+        return [player_name for player_name, _ in removed]
+    
+    def remove_player(self, player_id, player_name):
+        """删除玩家，并从游戏记录中移除其分数"""
+        with self._data_lock:
+            self._remove_player(player_id, player_name)
+    
+    def _remove_player(self, player_id, player_name):
+        self.players = [p for p in self.players if p['id'] != player_id]
+        
+        # 更新游戏记录，移除该玩家的分数（只处理索引中该玩家参加过的游戏）
+        removed_id = self.registry.get(player_name)
+        for position in self.player_index.remove_player(player_name):
+            old_game = self.games[position]
+            game = self._without_player(old_game, removed_id)
+            self.games[position] = game
+            # 撤销该局原有的统计，再计入新记录
+            self.stats.remove_game(old_game)
+            self.head_to_head.remove_game(old_game)
+            self.stats.add_game(game)
+            self.head_to_head.add_game(game)
+        self._invalidate_records()
+    
+    def _without_player(self, game, player_id):
+        """返回清除玩家后的新记录，原记录保持不变（可能正被后台保存任务的快照引用）"""
+        game = game.without_seat(game.seat(player_id))
+        # 如果胜者是该玩家，需要重新计算胜者
+        if game.winner_id == player_id:
+            if game.scores:
+                best_seat = max(range(len(game.scores)), key=game.scores.__getitem__)
+                game.winner_id = game.player_ids[best_seat]
+            else:
+                game.winner_id = self.registry.intern("无")
+        return rank_game(game, self.tie_rule)
+    
+    def _invalidate_records(self):
+        """已有记录的名次和胜者改变后调用：滚动排行榜、Elo评分和向量化引擎在下次使用时重建"""
+        self.rolling.invalidate()
+        with self._elo_lock:
+            self._elo = None
+            self._elo_generation += 1
+        self._numpy = None
+        self._numpy_generation += 1
+        self._records_generation += 1
+        self.data_version += 1
+    
+    @instrumented
+    def build_report(self, player_name):
+        """生成玩家报告的文本和图表数据，没有记录时返回None"""
+        # 置信区间的重抽样和向量化引擎的构建较慢，先在数据锁之外完成
+        interval = self.confidence_interval(player_name)
+        if self.analytics == 'numpy':
+            self.numpy_analytics()
+        with self._data_lock:
+            return self._build_report(player_name, interval)
+    
+    def _build_report(self, player_name, interval):
+        # 获取玩家的所有游戏记录
+        player_games = self.player_index.player_games(self.games, player_name)
+        if not player_games:
+            return None
+        
+        # 计算统计信息
+        summary = self.player_summary(player_name)
+        total_games = summary['total_games']
+        avg_rank_percentage = summary['avg_rank_percentage']
+        
+        # 显示统计信息
+        report_text = f"""
+玩家: {player_name}
+总游戏场次: {total_games}
+获胜场次: {summary['wins']}
+胜率: {summary['win_rate']:.2f}%
+平均得分: {summary['avg_score']:.2f}
+最高得分: {summary['max_score']}
+最低得分: {summary['min_score']}
+平均排名百分比(100%为第一名，0%为最后一名): {avg_rank_percentage:.2f}%
+评分(Rating): {summary['rating']:.2f}
+"""
+        if interval is not None:
+            level = f"{self.bootstrap_confidence * 100:g}%"
+            rating_low, rating_high = interval['rating']
+            percentage_low, percentage_high = interval['avg_rank_percentage']
+            report_text += f"Rating {level}置信区间: {rating_low:.2f} ~ {rating_high:.2f}\n"
+            report_text += f"平均排名百分比 {level}置信区间: {percentage_low:.2f}% ~ {percentage_high:.2f}%\n"
+        report_text += "\n最近5场游戏记录:\n"
+        # 添加最近5场游戏记录
+        player_id = self.registry.get(player_name)
+        seats = [game.seat(player_id) for game in player_games]
+        recent_games = []
+        for game, seat in zip(player_games[-5:], seats[-5:]):
+            won = game.winner_id == player_id
+            recent_games.append({
+                'date': game.date,
+                'score': game.scores[seat],
+                'rank': game.ranks[seat],
+                'player_count': game.player_count,
+                'won': won
+            })
+            report_text += f"{game.date}: 得分 {game.scores[seat]}, 排名 {game.ranks[seat]}/{game.player_count}, {'获胜' if won else '未获胜'}\n"
+        
+        # 显示全局统计
+        report_text += f"\n全局统计:\n"
+        report_text += f"总游戏局数: {len(self.games)}\n"
+        
+        # 最高分和最低分直接读取累计统计
+        score_range = self.stats.score_range()
+        
+        if score_range:
+            report_text += f"全系统最高分: {score_range[1]}\n"
+            report_text += f"全系统最低分: {score_range[0]}\n"
         
+        # 添加图表显示条件
+        if total_games < 5:
+            report_text += f"\n注意: 由于玩家 {player_name} 只参加了 {total_games} 场游戏，不足5场，因此不显示分析图表。"
+        
+        return {
+            'player': player_name,
+            'summary': summary,
+            'recent_games': recent_games,
+            'global_games': len(self.games),
+            'score_range': score_range,
+            'confidence_interval': interval,
+            # 图表数据，排名百分比已在加载时算好
+            'scores': [game.scores[seat] for game, seat in zip(player_games, seats)],
+            'is_winner': [game.winner_id == player_id for game in player_games],
+            'rank_percentages': [game.rank_percentages[seat] for game, seat in zip(player_games, seats)],
+            'text': report_text
+        }
+    
+    def cached_report(self, player_name):
+        """带缓存的 build_report，数据没有变化时直接返回上次的结果（与缓存共用，不能修改）"""
+        return self.stats_cache.get(('report', player_name), lambda: self.build_report(player_name))
+
+class ReportChart:
+    """玩家报告图表：坐标轴和线条只创建一次，切换玩家时原地更新数据"""
+    
+    def __init__(self, fig):
+        self.fig = fig
+        # 分数变化图，使用游戏序号而不是日期作为X轴
+        self.score_ax = fig.add_subplot(2, 1, 1)
+        self.score_line, = self.score_ax.plot([], [], 'o-', label='分数')
+        # 标记获胜的游戏
+        self.win_line, = self.score_ax.plot([], [], 'ro', label='获胜')
+        self.score_ax.set_xlabel('游戏序号')
+        self.score_ax.set_ylabel('分数')
+        self.score_ax.grid(True)
+        self.score_ax.legend()
+        
+        # 排名百分比图
+        self.rank_ax = fig.add_subplot(2, 1, 2)
+        self.rank_line, = self.rank_ax.plot([], [], 'o-', color='green')
+        self.avg_line = self.rank_ax.axhline(y=0, color='r', linestyle='--')
+        self.rank_ax.set_xlabel('游戏序号')
+        self.rank_ax.set_ylabel('排名百分比 (%)')
+        self.rank_ax.set_ylim(-5, 105)
+        self.rank_ax.grid(True)
+        self.clear()
+    
+    def update(self, report):
+        """用报告数据替换线条内容并调整坐标范围"""
+        player_name = report['player']
+        scores = report['scores']
+        is_winner = report['is_winner']
+        total_games = len(scores)
+        score_range = report['score_range']
+        avg_rank_percentage = report['summary']['avg_rank_percentage']
+        game_numbers = list(range(1, total_games + 1))
+        
+        self.score_line.set_data(game_numbers, scores)
+        self.win_line.set_data([i+1 for i in range(total_games) if is_winner[i]],
+                               [scores[i] for i in range(total_games) if is_winner[i]])
+        self.score_ax.set_title(f'{player_name} 的分数变化')
+        self.score_ax.set_ylim(score_range[0] - 1, score_range[1] + 1)
+        
+        self.rank_line.set_data(game_numbers, report['rank_percentages'])
+        self.rank_ax.set_title(f'{player_name} 的排名百分比变化')
+        self.avg_line.set_ydata([avg_rank_percentage, avg_rank_percentage])
+        self.avg_line.set_label(f'平均: {avg_rank_percentage:.2f}%')
+        self.avg_line.set_visible(True)
+        self.rank_ax.legend()
+        
+        # X轴与原来一样由数据自动确定，Y轴保持上面设定的范围
+        for ax in (self.score_ax, self.rank_ax):
+            ax.relim()
+            ax.autoscale_view(scaley=False)
+        self.fig.tight_layout()
+    
+    def clear(self):
+        """清空图表内容（场次不足或尚未选择玩家时）"""
+        for line in (self.score_line, self.win_line, self.rank_line):
+            line.set_data([], [])
+        self.avg_line.set_visible(False)
+        self.score_ax.set_title('')
+        self.rank_ax.set_title('')
+        legend = self.rank_ax.get_legend()
+        if legend is not None:
+            legend.remove()
+
+def render_report_chart(job):
+    """进程池任务：不经过 pyplot，直接用Agg画布把一名玩家的图表保存为PNG"""
+    report, path = job
+    import_matplotlib()
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=(10, 8))
+    FigureCanvasAgg(fig)
+    ReportChart(fig).update(report)
+    fig.savefig(path)
+    return path
+
+def sorted_quantile(ordered, q):
+    """已排序数据的q分位数，在相邻两个值之间线性插值"""
+    position = q * (len(ordered) - 1)
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def bootstrap_tasks(job, chunk_size):
+    """把一名玩家的bootstrap任务按重抽样次数分块，每块是 bootstrap_resample 的一个进程池任务
+
+    job 为 (玩家, 取值列表, 各取值的局数, 重抽样次数, 随机种子, 置信水平)，取值为每局的 (加权胜局, 排名百分比)，
+    加权胜局为获胜时的人数、未获胜时为0，两者的平均值即 Rating 和平均排名百分比。
+    每局的取值只有少数几种，任务中只包含各取值的局数，大小与对局数无关。
+    """
+    player_name, values, counts, resamples, seed, _ = job
+    return [(player_name, values, counts, min(chunk_size, resamples - start), seed, start // chunk_size)
+            for start in range(0, resamples, chunk_size)]
+
+def bootstrap_cost(task):
+    """bootstrap_resample 处理一个任务的计算量：按取值抽样时为 重抽样次数×取值种数，逐局抽样时为 重抽样次数×对局数"""
+    _, values, counts, resamples, _, _ = task
+    if import_numpy() is None and not hasattr(random.Random, 'binomialvariate'):
+        return resamples * sum(counts)
+    return resamples * len(values)
+
+def bootstrap_resample(task):
+    """进程池任务：对一名玩家的逐局数据做一块bootstrap重抽样，返回 (玩家, 各次的Rating, 各次的平均排名百分比)
+
+    有放回地抽取全部对局等价于按各取值出现的频率做多项分布抽样：有 numpy 时一次抽出整块；
+    否则在 Python 3.12 及以上每次重抽样按取值依次做条件二项分布抽样（random.binomialvariate），
+    耗时与对局数无关；更早的版本用 random.choices 逐局抽样。
+    随机数只由种子、玩家名称和块序号决定，与进程分配无关；但三种抽样方式的随机数序列不同，
+    同一种子在有无 numpy、不同 Python 版本下得到的区间会有抽样误差范围内的差别。
+    """
+    player_name, values, counts, resamples, seed, chunk = task
+    total_games = sum(counts)
+    player_seed = int.from_bytes(hashlib.blake2b(player_name.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    np = import_numpy()
+    if np is not None:
+        rng = np.random.default_rng([seed, player_seed, chunk])
+        draws = rng.multinomial(total_games, np.array(counts, dtype=np.float64) / total_games, size=resamples)
+        means = draws @ np.array(values, dtype=np.float64) / total_games
+        return player_name, means[:, 0].tolist(), means[:, 1].tolist()
+
+    rng = random.Random(f"{seed}-{player_seed}-{chunk}")
+    ratings, averages = [], []
+    if not hasattr(rng, 'binomialvariate'):
+        for _ in range(resamples):
+            draws = rng.choices(values, weights=counts, k=total_games)
+            ratings.append(sum(weighted_win for weighted_win, _ in draws) / total_games)
+            averages.append(sum(rank_percentage for _, rank_percentage in draws) / total_games)
+        return player_name, ratings, averages
+    for _ in range(resamples):
+        # 依次抽出每种取值的局数：在剩余的抽取次数中，按该取值在剩余频率中的比例做二项分布抽样
+        remaining_draws = remaining_count = total_games
+        rating_sum = average_sum = 0
+        for (weighted_win, rank_percentage), count in zip(values, counts):
+            drawn = rng.binomialvariate(remaining_draws, count / remaining_count)
+            rating_sum += weighted_win * drawn
+            average_sum += rank_percentage * drawn
+            remaining_draws -= drawn
+            remaining_count -= count
+            if not remaining_draws:
+                break
+        ratings.append(rating_sum / total_games)
+        averages.append(average_sum / total_games)
+    return player_name, ratings, averages
+
+def bootstrap_intervals(player_name, ratings, averages, confidence):
+    """由重抽样得到的Rating和平均排名百分比计算置信区间"""
+    ratings = sorted(ratings)
+    averages = sorted(averages)
+    alpha = (1 - confidence) / 2
+    return {
+        'player': player_name,
+        'rating': (sorted_quantile(ratings, alpha), sorted_quantile(ratings, 1 - alpha)),
+        'avg_rank_percentage': (sorted_quantile(averages, alpha), sorted_quantile(averages, 1 - alpha))
+    }
+
+def report_filename(player_name):
+    """把玩家名称转换为可用的文件名"""
+    return re.sub(r'[\\/:*?"<>|\s]', '_', player_name) or '_'
+
+def run_batch(output_dir, storage=None, tie_rule='competition', analytics='python', workers=None):
+    """无界面批处理：生成全部玩家的文本/JSON报告，并用进程池并行渲染PNG图表"""
+    data = ScoreData(storage, tie_rule, analytics)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # 先用进程池一次算出全部玩家的置信区间，生成报告时直接使用缓存
+    data.confidence_intervals()
+    reports = []
+    chart_jobs = []
+    for player in data.players:
+        player_name = player['name']
+        report = data.build_report(player_name)
+        stem = report_filename(player_name)
+        text = report['text'] if report else f"玩家 {player_name} 暂无游戏记录"
+        with open(os.path.join(output_dir, stem + ".txt"), 'w', encoding='utf-8') as f:
+            f.write(text)
+        if report is None:
+            reports.append({'player': player_name, 'summary': None})
+            continue
+        reports.append({key: report[key] for key in ('player', 'summary', 'confidence_interval', 'recent_games')})
+        # 与界面一致，参与不足5场时不生成图表
+        if report['summary']['total_games'] >= 5:
+            chart_jobs.append((report, os.path.join(output_dir, stem + ".png")))
+    
+    leaderboard = sorted(data.compute_leaderboard().values(), key=lambda x: x['rating'], reverse=True)
+    with open(os.path.join(output_dir, "reports.json"), 'w', encoding='utf-8') as f:
+        json.dump({'leaderboard': leaderboard, 'reports': reports}, f, ensure_ascii=False, indent=2)
+    
+    if chart_jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(render_report_chart, chart_jobs))
+    return len(reports), len(chart_jobs)
+
+class BackgroundWorker:
+    """在后台线程中按提交顺序执行任务，结果通过 root.after 定时交回界面线程处理
+
+    提交任务时可以指定名称，同名任务再次提交后，之前的任务作废：还在排队的直接跳过，
+    正在执行的结果被丢弃。不指定名称的任务（例如追加一条记录）总会执行。
+    """
+
+    def __init__(self, root, poll_interval=50):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        # 任务名称 -> 最新一次提交的编号
+        self.latest = {}
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self.root.after(self.poll_interval, self._poll)
+
+    def submit(self, name, func, args=(), callback=None, on_error=None):
+        """提交任务，func(*args) 在后台线程执行，callback(结果) / on_error(异常) 在界面线程执行"""
+        serial = self.latest.get(name, 0) + 1
+        if name is not None:
+            self.latest[name] = serial
+        self.jobs.put((name, serial, func, args, callback, on_error))
+
+    def cancel(self, name):
+        """作废同名的全部任务"""
+        self.latest[name] = self.latest.get(name, 0) + 1
+
+    def _is_current(self, name, serial):
+        return name is None or self.latest.get(name) == serial
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            name, serial, func, args, callback, on_error = job
+            try:
+                if not self._is_current(name, serial):
+                    continue
+                try:
+                    result = instrumentation.run_task(func, args)
+                except Exception as e:
+                    self.results.put((job, False, e))
+                else:
+                    self.results.put((job, True, result))
+            finally:
+                self.jobs.task_done()
+
+    def _poll(self):
+        """在界面线程中处理已完成的任务"""
+        # 先安排下一次检查，回调出错也不会中断轮询
+        self.root.after(self.poll_interval, self._poll)
+        while True:
+            try:
+                (name, serial, func, args, callback, on_error), ok, value = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if not self._is_current(name, serial):
+                continue
+            handler = callback if ok else on_error
+            if handler is not None:
+                handler(value)
+
+    def wait(self):
+        """等待所有已提交的任务执行完毕"""
+        self.jobs.join()
+
+class GameScoreSystem(ScoreData):
+    # 历史记录每次加载的行数
+    history_page_size = 200
+    # 删除玩家后等待多久（毫秒）再从游戏记录中清除并保存，在此之前可以撤销
+    compaction_delay = 60000
+    # 排行榜范围选项：(ROLLING_WINDOWS 中的种类或None表示全部, 显示名称)
+    ranking_window_labels = ((None, "全部"), ('games', "最近N局"), ('days', "最近N天"),
+                             ('month', "按月"), ('season', "按季度"))
+    # 分析选项卡中缓存的玩家报告和图表数量
+    chart_cache_size = 16
+    # 跟随模式下检查 games.csv 是否有外部追加的间隔（毫秒）
+    follow_interval = 2000
+    
+    def __init__(self, storage=None, tie_rule='competition', analytics='python', follow=False):
         # 初始化数据
-        self.players = self.load_players()
-        self.games = self.load_games()
+        super().__init__(storage, tie_rule, analytics)
         
         # 创建主窗口
         self.root = tk.Tk()
         self.root.title("桌游积分管理系统")
         self.root.geometry("1000x700")  # 增加窗口大小以适应新选项卡
+        # 统计和保存在后台线程执行，避免界面卡住
+        self.worker = BackgroundWorker(self.root)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        # 等待执行的清除任务
+        self.compaction_job = None
+        # 跟随模式下的下一次检查
+        self.follow_job = None
         
         # 创建界面
         self.create_gui()
+        # 上次退出前删除、尚未清除的玩家
+        if self.deleted_players:
+            self.schedule_compaction()
+        if follow:
+            self.follow_job = self.root.after(self.follow_interval, self.poll_games_file)
         
-    def load_players(self):
-        """加载玩家数据"""
-        players = []
-        if os.path.exists(self.players_file):
-            with open(self.players_file, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    players.append(row)
-        return players
+    def load_games(self):
+        """加载游戏数据，出错时提示"""
+        try:
+            return super().load_games()
+        except Exception as e:
+            messagebox.showerror("错误", f"加载游戏数据时出错: {str(e)}")
+            return []
+    
+    def save_games(self):
+        """在后台线程保存游戏数据，排队中被后续保存取代的会跳过"""
+        # 提交时的记录快照：排队期间新增的记录由之后的追加任务写入，不会重复；
+        # 排队期间从 games.csv 读入的外部追加记录由存储按 appended_mark 补写
+        self.worker.submit('save_games', super().save_games, (list(self.games), self.storage.appended_mark()),
+                           on_error=self.show_save_error)
+    
+    def append_game(self, game):
+        """在后台线程追加一条新记录，与整体保存按提交顺序执行"""
+        self.worker.submit(None, super().append_game, (game, list(self.games), self.storage.appended_mark()),
+                           on_error=self.show_save_error)
+    
+    def remove_player_games(self, player_names):
+        """在后台线程从存储的游戏记录中清除玩家；每次都会执行，不会被之后提交的整体保存取代"""
+        self.worker.submit(None, super().remove_player_games,
+                           (player_names, list(self.games), self.storage.appended_mark()),
+                           on_error=self.show_save_error)
     
     def save_players(self):
-        """保存玩家数据"""
-        with open(self.players_file, 'w', newline='', encoding='utf-8') as f:
-            fieldnames = ['id', 'name']
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for player in self.players:
-                player_data = {'id': player['id'], 'name': player['name']}
-                writer.writerow(player_data)
+        """在后台线程保存玩家列表，与游戏记录和已删除玩家的保存按提交顺序执行"""
+        self.worker.submit('save_players', super().save_players, (list(self.players),),
+                           on_error=self.show_save_error)
     
-    def load_games(self):
-        """加载游戏数据"""
-        games = []
-        if os.path.exists(self.games_file):
-            try:
-                # 首先尝试UTF-8编码
-                with open(self.games_file, 'r', newline='', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        # 将分数从字符串转换为字典
-                        scores = eval(row['scores'])
-                        row['scores'] = scores
-                        # 确保player_count是整数
-                        row['player_count'] = int(row['player_count'])
-                        games.append(row)
-            except UnicodeDecodeError:
-                try:
-                    # 如果UTF-8失败，尝试GBK编码（常见于中文Windows系统）
-                    with open(self.games_file, 'r', newline='', encoding='gbk') as f:
-                        reader = csv.DictReader(f)
-                        for row in reader:
-                            # 将分数从字符串转换为字典
-                            scores = eval(row['scores'])
-                            row['scores'] = scores
-                            # 确保player_count是整数
-                            row['player_count'] = int(row['player_count'])
-                            games.append(row)
-                except UnicodeDecodeError:
-                    # 如果两种编码都失败，尝试使用errors='ignore'忽略错误字符
-                    with open(self.games_file, 'r', newline='', encoding='utf-8', errors='ignore') as f:
-                        reader = csv.DictReader(f)
-                        for row in reader:
-                            # 将分数从字符串转换为字典
-                            scores = eval(row['scores'])
-                            row['scores'] = scores
-                            # 确保player_count是整数
-                            row['player_count'] = int(row['player_count'])
-                            games.append(row)
-            except Exception as e:
-                messagebox.showerror("错误", f"加载游戏数据时出错: {str(e)}")
-        return games
+    def save_deleted_players(self):
+        """在后台线程保存已删除的玩家；每次都会执行，保证先于之后提交的玩家列表写入"""
+        self.worker.submit(None, super().save_deleted_players, (self.deleted_player_rows(),),
+                           on_error=self.show_save_error)
     
-    def save_games(self):
-        """保存游戏数据"""
-        with open(self.games_file, 'w', newline='', encoding='utf-8') as f:
-            fieldnames = ['date', 'player_count', 'scores', 'winner']
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for game in self.games:
-                # 创建副本以避免修改原始数据
-                game_copy = game.copy()
-                game_copy['scores'] = str(game['scores'])  # 将字典转换为字符串
-                writer.writerow(game_copy)
+    def show_save_error(self, error):
+        """保存失败时提示"""
+        messagebox.showerror("错误", f"保存游戏数据时出错: {str(error)}")
+    
+    def poll_games_file(self):
+        """跟随模式：把其他程序追加到 games.csv 的记录加入数据，文件被截短或改写时重新加载"""
+        self.follow_job = self.root.after(self.follow_interval, self.poll_games_file)
+        try:
+            games = self.storage.read_appended_games()
+        except (OSError, ValueError):
+            # 文件正在被改写等情况，下次再检查
+            return
+        if games is None:
+            self.reload_data()
+        elif games:
+            self.ingest_games(games)
+    
+    @instrumented
+    def ingest_games(self, games):
+        """加入已在存储中的新记录：与保存记录一样增量更新统计并刷新界面，但不再写入存储"""
+        for game in games:
+            self.prepend_history(self.add_game(game))
+        self.refresh_ranking()
+        self.refresh_head_to_head()
+    
+    @instrumented
+    def reload_data(self):
+        """重新加载全部数据并刷新界面"""
+        self.reload()
+        self.refresh_player_views()
+    
+    def on_close(self):
+        """关闭窗口前清除已删除的玩家，并等待后台保存完成"""
+        if self.follow_job is not None:
+            self.root.after_cancel(self.follow_job)
+        self.compact_players()
+        self.worker.wait()
+        self.root.destroy()
     
     def create_gui(self):
-        """创建图形用户界面"""
+        """创建图形用户界面：只创建当前显示的选项卡，其余选项卡在第一次切换到时再创建"""
         # 创建选项卡
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill='both', expand=True, padx=10, pady=10)
@@ -116,22 +2637,47 @@ class GameScoreSystem:
         # 玩家管理选项卡
         self.player_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.player_frame, text="玩家管理")
-        self.create_player_tab()
         
         # 游戏记录选项卡
         self.record_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.record_frame, text="游戏记录")
-        self.create_record_tab()
         
         # 数据分析选项卡
         self.analysis_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.analysis_frame, text="数据分析")
-        self.create_analysis_tab()
         
         # 排行榜选项卡
         self.ranking_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.ranking_frame, text="排行榜")
-        self.create_ranking_tab()
+        
+        # 交锋统计选项卡
+        self.head_to_head_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.head_to_head_frame, text="交锋统计")
+        
+        # 性能诊断选项卡
+        self.diagnostics_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.diagnostics_frame, text="性能诊断")
+        
+        # 尚未创建内容的选项卡及其创建函数
+        self.pending_tabs = {
+            str(self.player_frame): self.create_player_tab,
+            str(self.record_frame): self.create_record_tab,
+            str(self.analysis_frame): self.create_analysis_tab,
+            str(self.ranking_frame): self.create_ranking_tab,
+            str(self.head_to_head_frame): self.create_head_to_head_tab,
+            str(self.diagnostics_frame): self.create_diagnostics_tab,
+        }
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        self.on_tab_changed()
+    
+    def on_tab_changed(self, event=None):
+        """切换到尚未创建的选项卡时创建并填充其内容"""
+        create_tab = self.pending_tabs.pop(self.notebook.select(), None)
+        if create_tab is not None:
+            create_tab()
+        elif self.notebook.select() == str(self.diagnostics_frame):
+            # 每次切换到诊断选项卡时显示最新的统计
+            self.refresh_diagnostics()
     
     def create_player_tab(self):
         """创建玩家管理选项卡"""
@@ -164,8 +2710,12 @@ class GameScoreSystem:
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.player_tree.pack(fill='both', expand=True)
         
-        # 删除按钮
-        ttk.Button(self.player_frame, text="删除选中玩家", command=self.delete_player).pack(pady=5)
+        # 删除和撤销按钮
+        button_frame = ttk.Frame(self.player_frame)
+        button_frame.pack(pady=5)
+        ttk.Button(button_frame, text="删除选中玩家", command=self.delete_selected_player).pack(side=tk.LEFT, padx=5)
+        self.undo_delete_button = ttk.Button(button_frame, text="撤销删除", command=self.undo_delete)
+        self.undo_delete_button.pack(side=tk.LEFT, padx=5)
         
         # 加载玩家数据
         self.refresh_player_list()
@@ -216,9 +2766,10 @@ class GameScoreSystem:
         self.history_tree.column('winner', width=50, anchor='center')
         
         # 添加滚动条
-        scrollbar = ttk.Scrollbar(history_frame, orient=tk.VERTICAL, command=self.history_tree.yview)
-        self.history_tree.configure(yscroll=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.history_scrollbar = ttk.Scrollbar(history_frame, orient=tk.VERTICAL, command=self.history_tree.yview)
+        # 滚动时检查是否需要加载更多记录
+        self.history_tree.configure(yscroll=self.on_history_scroll)
+        self.history_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.history_tree.pack(fill='both', expand=True)
         
         # 加载历史记录
@@ -236,10 +2787,19 @@ class GameScoreSystem:
         self.analysis_player_combo.grid(row=0, column=1, padx=5, pady=5)
         
         ttk.Button(select_frame, text="生成报告", command=self.generate_report).grid(row=0, column=2, padx=5, pady=5)
+        # 报告在后台计算时显示进度
+        self.analysis_progress = ttk.Progressbar(select_frame, mode='indeterminate', length=120)
+        self.analysis_progress.grid(row=0, column=3, padx=5, pady=5)
         
         # 数据展示区域
-        self.analysis_text = tk.Text(self.analysis_frame, wrap=tk.WORD)
-        self.analysis_text.pack(fill='both', expand=True, padx=10, pady=5)
+        self.analysis_text = tk.Text(self.analysis_frame, wrap=tk.WORD, height=12)
+        self.analysis_text.pack(fill='x', padx=10, pady=5)
+        
+        # 图表嵌入选项卡内，所有玩家共用同一个画布，第一次需要显示图表时才创建
+        self.report_chart = None
+        self.report_canvas = None
+        # 最近查看过的报告和渲染好的图像，按 (玩家, 数据版本) 缓存
+        self.chart_cache = OrderedDict()
         
         # 加载玩家数据到下拉框
         self.refresh_analysis_players()
@@ -269,6 +2829,38 @@ class GameScoreSystem:
         
         ttk.Button(button_frame, text="刷新排行榜", command=self.refresh_ranking).pack(side=tk.LEFT, padx=5)
         
+        # 统计范围：全部、最近N局、最近N天、按月、按季度
+        ttk.Label(button_frame, text="范围:").pack(side=tk.LEFT, padx=(15, 5))
+        self.ranking_window_var = tk.StringVar(value=self.ranking_window_labels[0][1])
+        window_combo = ttk.Combobox(button_frame, textvariable=self.ranking_window_var, state="readonly", width=10,
+                                    values=[label for _, label in self.ranking_window_labels])
+        window_combo.pack(side=tk.LEFT, padx=5)
+        window_combo.bind('<<ComboboxSelected>>', lambda event: self.refresh_ranking())
+        # 最近N局/N天的N
+        self.ranking_count_var = tk.IntVar(value=50)
+        self.ranking_count_spin = ttk.Spinbox(button_frame, from_=1, to=100000, width=7,
+                                              textvariable=self.ranking_count_var, command=self.refresh_ranking)
+        self.ranking_count_spin.bind('<Return>', lambda event: self.refresh_ranking())
+        self.ranking_count_spin.pack(side=tk.LEFT, padx=5)
+        # 按月/季度时选择的周期
+        self.ranking_period_var = tk.StringVar()
+        self.ranking_period_combo = ttk.Combobox(button_frame, textvariable=self.ranking_period_var,
+                                                 state="readonly", width=10)
+        self.ranking_period_combo.bind('<<ComboboxSelected>>', lambda event: self.refresh_ranking())
+        self.ranking_period_combo.pack(side=tk.LEFT, padx=5)
+        # 可选的置信区间列，只对全部记录计算
+        self.ranking_ci_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(button_frame, text="置信区间", variable=self.ranking_ci_var,
+                        command=self.toggle_confidence_columns).pack(side=tk.LEFT, padx=5)
+        
+        # 排行榜在后台计算时显示进度
+        self.ranking_progress = ttk.Progressbar(button_frame, mode='indeterminate', length=120)
+        self.ranking_progress.pack(side=tk.LEFT, padx=5)
+        
+        # 有尚未清除的已删除玩家时提示统计暂时仍包含其对局
+        self.ranking_pending_label = ttk.Label(main_frame, foreground='gray', wraplength=900)
+        self.ranking_pending_label.pack(fill='x', padx=5)
+        
         # 创建左右两个框架来并排显示两个排行榜
         content_frame = ttk.Frame(main_frame)
         content_frame.pack(side=tk.LEFT, fill='both', expand=True, pady=5)
@@ -283,17 +2875,21 @@ class GameScoreSystem:
         rating_frame.pack(fill='both', expand=True)
         
         # 创建树形视图
-        columns = ('rank', 'name', 'rating', 'total_games', 'wins')
+        columns = ('rank', 'name', 'rating', 'rating_ci', 'elo', 'total_games', 'wins')
         self.rating_tree = ttk.Treeview(rating_frame, columns=columns, show='headings')
         self.rating_tree.heading('rank', text='排名')
         self.rating_tree.heading('name', text='玩家名称')
         self.rating_tree.heading('rating', text='RATING')
+        self.rating_tree.heading('rating_ci', text='置信区间')
+        self.rating_tree.heading('elo', text='ELO')
         self.rating_tree.heading('total_games', text='总局数')
         self.rating_tree.heading('wins', text='获胜局数')
         
         self.rating_tree.column('rank', width=50, anchor='center')
         self.rating_tree.column('name', width=150, anchor='center')
         self.rating_tree.column('rating', width=100, anchor='center')
+        self.rating_tree.column('rating_ci', width=110, anchor='center')
+        self.rating_tree.column('elo', width=80, anchor='center')
         self.rating_tree.column('total_games', width=80, anchor='center')
         self.rating_tree.column('wins', width=80, anchor='center')
         
@@ -308,17 +2904,19 @@ class GameScoreSystem:
         rank_percentage_frame.pack(fill='both', expand=True)
         
         # 创建树形视图
-        columns2 = ('rank', 'name', 'avg_rank_percentage', 'total_games')
+        columns2 = ('rank', 'name', 'avg_rank_percentage', 'rank_percentage_ci', 'total_games')
         self.rank_percentage_tree = ttk.Treeview(rank_percentage_frame, columns=columns2, show='headings')
         self.rank_percentage_tree.heading('rank', text='排名', anchor='center')
         self.rank_percentage_tree.heading('name', text='玩家名称', anchor='center')
         self.rank_percentage_tree.heading('avg_rank_percentage', text='平均排名百分比', anchor='center')
+        self.rank_percentage_tree.heading('rank_percentage_ci', text='置信区间', anchor='center')
         self.rank_percentage_tree.heading('total_games', text='总局数', anchor='center')
         
         # 设置列宽和对齐方式
         self.rank_percentage_tree.column('rank', width=50, anchor='center')
         self.rank_percentage_tree.column('name', width=150, anchor='center')
         self.rank_percentage_tree.column('avg_rank_percentage', width=120, anchor='center')
+        self.rank_percentage_tree.column('rank_percentage_ci', width=130, anchor='center')
         self.rank_percentage_tree.column('total_games', width=80, anchor='center')
         
         # 添加滚动条
@@ -326,56 +2924,278 @@ class GameScoreSystem:
         self.rank_percentage_tree.configure(yscroll=scrollbar2.set)
         scrollbar2.pack(side=tk.RIGHT, fill=tk.Y)
         self.rank_percentage_tree.pack(fill='both', expand=True)
-                
-
+        
+        # 置信区间列默认隐藏
+        self.toggle_confidence_columns(refresh=False)
                 
         # 初始加载排行榜
         self.refresh_ranking()
         
-    def calculate_avg_rank_percentage(self, player_name):
-        """计算玩家的平均排名百分比"""
-        player_games = []
-        for game in self.games:
-            if player_name in game['scores']:
-                player_games.append(game)
-        
-        if not player_games:
-            return 0, 0
+    def create_head_to_head_tab(self):
+        """创建交锋统计选项卡"""
+        filter_frame = ttk.LabelFrame(self.head_to_head_frame, text="筛选")
+        filter_frame.pack(fill='x', padx=10, pady=5)
+        
+        ttk.Label(filter_frame, text="玩家:").grid(row=0, column=0, padx=5, pady=5)
+        self.head_to_head_player_var = tk.StringVar(value="全部")
+        self.head_to_head_player_combo = ttk.Combobox(filter_frame, textvariable=self.head_to_head_player_var,
+                                                      state="readonly")
+        self.head_to_head_player_combo.grid(row=0, column=1, padx=5, pady=5)
+        self.head_to_head_player_combo.bind('<<ComboboxSelected>>', lambda event: self.refresh_head_to_head())
+        
+        ttk.Label(filter_frame, text="最少同局数:").grid(row=0, column=2, padx=5, pady=5)
+        self.head_to_head_min_var = tk.IntVar(value=1)
+        min_spin = ttk.Spinbox(filter_frame, from_=1, to=100000, width=7, textvariable=self.head_to_head_min_var,
+                               command=self.refresh_head_to_head)
+        min_spin.bind('<Return>', lambda event: self.refresh_head_to_head())
+        min_spin.grid(row=0, column=3, padx=5, pady=5)
+        self.head_to_head_pending_label = ttk.Label(filter_frame, foreground='gray', wraplength=900)
+        self.head_to_head_pending_label.grid(row=1, column=0, columnspan=4, sticky='w', padx=5)
+        
+        # 交锋表格
+        list_frame = ttk.Frame(self.head_to_head_frame)
+        list_frame.pack(fill='both', expand=True, padx=10, pady=5)
         
-        rank_percentages = []
-        for game in player_games:
-            player_count = int(game['player_count'])
-            player_score = game['scores'][player_name]
-            
-            # 获取该游戏中所有分数
-            game_scores = list(game['scores'].values())
-            # 计算排名百分比
-            sorted_scores = sorted(game_scores, reverse=True)
-            rank = sorted_scores.index(player_score) + 1
-            rank_percentage = (player_count - rank) / (player_count - 1) * 100 if player_count > 1 else 100
-            rank_percentages.append(rank_percentage)
+        columns = ('player', 'opponent', 'games', 'above', 'below', 'ties', 'above_rate', 'avg_score_diff')
+        self.head_to_head_tree = ttk.Treeview(list_frame, columns=columns, show='headings')
+        self.head_to_head_tree.heading('player', text='玩家')
+        self.head_to_head_tree.heading('opponent', text='对手')
+        self.head_to_head_tree.heading('games', text='同局数')
+        self.head_to_head_tree.heading('above', text='名次领先')
+        self.head_to_head_tree.heading('below', text='名次落后')
+        self.head_to_head_tree.heading('ties', text='名次相同')
+        self.head_to_head_tree.heading('above_rate', text='领先率')
+        self.head_to_head_tree.heading('avg_score_diff', text='平均分差')
+        
+        self.head_to_head_tree.column('player', width=120, anchor='center')
+        self.head_to_head_tree.column('opponent', width=120, anchor='center')
+        for column in columns[2:]:
+            self.head_to_head_tree.column(column, width=80, anchor='center')
+        
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.head_to_head_tree.yview)
+        self.head_to_head_tree.configure(yscroll=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.head_to_head_tree.pack(fill='both', expand=True)
         
-        avg_rank_percentage = sum(rank_percentages) / len(rank_percentages) if rank_percentages else 0
-        return avg_rank_percentage, len(player_games)
+        self.refresh_head_to_head()
+    
+    @instrumented
+    def refresh_head_to_head(self):
+        """按筛选条件显示交锋统计（直接读取已累计的数据）"""
+        if not hasattr(self, 'head_to_head_tree'):
+            return
+        self.head_to_head_pending_label.config(text=self.pending_deletion_text())
+        player_names = [player['name'] for player in self.players]
+        self.head_to_head_player_combo['values'] = ["全部"] + player_names
+        player = self.head_to_head_player_var.get()
+        if player not in player_names:
+            player = None
+            self.head_to_head_player_var.set("全部")
+        try:
+            min_games = max(1, self.head_to_head_min_var.get())
+        except tk.TclError:
+            min_games = 1
+        
+        rows = self.head_to_head.rows(player_names, player, min_games)
+        rows.sort(key=lambda row: (-row['games'], row['player'], row['opponent']))
+        self.head_to_head_tree.delete(*self.head_to_head_tree.get_children())
+        for row in rows:
+            self.head_to_head_tree.insert("", "end", values=(
+                row['player'],
+                row['opponent'],
+                row['games'],
+                row['above'],
+                row['below'],
+                row['ties'],
+                f"{row['above'] / row['games'] * 100:.1f}%",
+                f"{row['avg_score_diff']:+.2f}"
+            ))
+    
+    def create_diagnostics_tab(self):
+        """创建性能诊断选项卡"""
+        control_frame = ttk.Frame(self.diagnostics_frame)
+        control_frame.pack(fill='x', padx=10, pady=5)
+        
+        self.instrumentation_var = tk.BooleanVar(value=instrumentation.enabled)
+        ttk.Checkbutton(control_frame, text="记录耗时", variable=self.instrumentation_var,
+                        command=self.toggle_instrumentation).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="刷新", command=self.refresh_diagnostics).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="清空", command=self.reset_diagnostics).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="导出JSON", command=self.export_diagnostics).pack(side=tk.LEFT, padx=5)
+        self.profile_button = ttk.Button(control_frame, text="开始 cProfile", command=self.toggle_profile)
+        self.profile_button.pack(side=tk.LEFT, padx=5)
+        
+        # 统计表格
+        columns = ('name', 'count', 'last', 'avg', 'p95')
+        self.diagnostics_tree = ttk.Treeview(self.diagnostics_frame, columns=columns, show='headings')
+        self.diagnostics_tree.heading('name', text='操作')
+        self.diagnostics_tree.heading('count', text='次数')
+        self.diagnostics_tree.heading('last', text='最近 (ms)')
+        self.diagnostics_tree.heading('avg', text='平均 (ms)')
+        self.diagnostics_tree.heading('p95', text='P95 (ms)')
+        
+        self.diagnostics_tree.column('name', width=250)
+        self.diagnostics_tree.column('count', width=60, anchor='center')
+        self.diagnostics_tree.column('last', width=80, anchor='center')
+        self.diagnostics_tree.column('avg', width=80, anchor='center')
+        self.diagnostics_tree.column('p95', width=80, anchor='center')
+        self.diagnostics_tree.pack(fill='both', expand=True, padx=10, pady=5)
+        
+        self.refresh_diagnostics()
+    
+    def toggle_instrumentation(self):
+        """开启或关闭耗时统计"""
+        instrumentation.enabled = self.instrumentation_var.get()
+    
+    def refresh_diagnostics(self):
+        """显示各操作的耗时统计和计数器"""
+        self.diagnostics_tree.delete(*self.diagnostics_tree.get_children())
+        for name, timing in sorted(self.diagnostics_rows().items()):
+            self.diagnostics_tree.insert("", "end", values=(name, *timing))
+    
+    def diagnostics_rows(self):
+        """诊断表格的内容：{名称: (次数, 最近, 平均, P95)}，计数器只有次数"""
+        rows = {}
+        for name, timing in instrumentation.summary().items():
+            rows[name] = (timing['count'], f"{timing['last'] * 1000:.2f}",
+                          f"{timing['avg'] * 1000:.2f}", f"{timing['p95'] * 1000:.2f}")
+        for name, count in instrumentation.counter_values().items():
+            rows[name] = (count, '', '', '')
+        # 统计缓存的命中情况总是记录
+        rows['stats_cache.hit'] = (self.stats_cache.hits, '', '', '')
+        rows['stats_cache.miss'] = (self.stats_cache.misses, '', '', '')
+        return rows
+    
+    def reset_diagnostics(self):
+        """清空统计"""
+        instrumentation.reset()
+        self.stats_cache.reset_counts()
+        self.refresh_diagnostics()
+    
+    def export_diagnostics(self):
+        """把统计导出为JSON文件"""
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")],
+                                            initialfile="diagnostics.json")
+        if not path:
+            return
+        try:
+            instrumentation.dump_json(path)
+        except OSError as e:
+            messagebox.showerror("错误", f"导出统计时出错: {str(e)}")
+    
+    def toggle_profile(self):
+        """开始记录 cProfile，或停止并保存结果"""
+        if instrumentation.profiler is None:
+            try:
+                instrumentation.start_profile()
+            except ValueError as e:
+                messagebox.showerror("错误", f"无法开始性能分析: {str(e)}")
+                return
+            self.profile_button.config(text="停止并保存 cProfile")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".prof", filetypes=[("cProfile", "*.prof")],
+                                            initialfile="profile.prof")
+        if not path:
+            # 取消保存时继续记录
+            return
+        try:
+            instrumentation.stop_profile(path)
+        except OSError as e:
+            messagebox.showerror("错误", f"保存性能分析结果时出错: {str(e)}")
+        self.profile_button.config(text="开始 cProfile")
     
+    @instrumented
     def refresh_ranking(self):
-        """刷新所有排行榜"""
+        """在后台计算排行榜，完成后刷新显示；重复刷新时只显示最后一次的结果"""
+        # 排行榜选项卡还没打开过时不用计算，打开时会刷新
+        if not hasattr(self, 'rating_tree'):
+            return
+        self.ranking_pending_label.config(text=self.pending_deletion_text())
+        self.update_ranking_window_controls()
+        window = self.ranking_window()
+        if window is not None and window[1] is None:
+            # 按月/季度但还没有任何记录
+            self.show_ranking({})
+            return
+        self.ranking_progress.start()
+        self.worker.submit('ranking', self.compute_ranking, (window, self.ranking_ci_var.get()),
+                           callback=lambda result: self.show_ranking(*result), on_error=self.show_ranking_error)
+    
+    def pending_deletion_text(self):
+        """尚未清除的已删除玩家的提示，没有时为空字符串"""
+        if not self.deleted_players:
+            return ""
+        return (f"已删除的玩家 {'、'.join(self.deleted_players)} 尚未从游戏记录中清除（删除约"
+                f"{self.compaction_delay // 1000}秒后清除，之前可以撤销），其他玩家的名次、胜局、Elo和交锋统计暂时仍包含其参加的对局")
+    
+    def compute_ranking(self, window, with_intervals):
+        """后台任务：返回 (排行榜, 置信区间)，置信区间只对全部记录计算，其他情况为空字典"""
+        leaderboard = self.cached_leaderboard(window)
+        intervals = self.confidence_intervals() if with_intervals and window is None else {}
+        return leaderboard, intervals
+    
+    def toggle_confidence_columns(self, refresh=True):
+        """按选项显示或隐藏两个排行榜的置信区间列"""
+        shown = self.ranking_ci_var.get()
+        for tree, column in ((self.rating_tree, 'rating_ci'), (self.rank_percentage_tree, 'rank_percentage_ci')):
+            tree['displaycolumns'] = [name for name in tree['columns'] if shown or name != column]
+        if refresh:
+            self.refresh_ranking()
+    
+    def ranking_window_kind(self):
+        """当前选择的范围种类，全部记录时为None"""
+        return dict((label, kind) for kind, label in self.ranking_window_labels)[self.ranking_window_var.get()]
+    
+    def ranking_window(self):
+        """当前选择的统计范围，全部记录时返回None"""
+        kind = self.ranking_window_kind()
+        if kind is None:
+            return None
+        if kind in ('games', 'days'):
+            try:
+                count = self.ranking_count_var.get()
+            except tk.TclError:
+                count = 0
+            return (kind, max(1, count))
+        return (kind, self.ranking_period_var.get() or None)
+    
+    def update_ranking_window_controls(self):
+        """按范围种类启用N输入框或周期选择框，并更新可选的周期"""
+        kind = self.ranking_window_kind()
+        self.ranking_count_spin.state(['!disabled'] if kind in ('games', 'days') else ['disabled'])
+        if kind in ('month', 'season'):
+            periods = self.rolling.periods(kind)
+            self.ranking_period_combo['values'] = periods
+            if self.ranking_period_var.get() not in periods:
+                self.ranking_period_var.set(periods[0] if periods else '')
+            self.ranking_period_combo.state(['!disabled'])
+        else:
+            self.ranking_period_combo.state(['disabled'])
+    
+    def show_ranking_error(self, error):
+        """排行榜计算失败时提示"""
+        self.ranking_progress.stop()
+        messagebox.showerror("错误", f"计算排行榜时出错: {str(error)}")
+    
+    @instrumented
+    def show_ranking(self, leaderboard, intervals=None):
+        """刷新所有排行榜，intervals 为各玩家的置信区间（见 bootstrap_intervals）"""
+        intervals = intervals or {}
+        
+        def interval_text(player_name, key, suffix=''):
+            interval = intervals.get(player_name)
+            if interval is None:
+                return ''
+            low, high = interval[key]
+            return f"{low:.2f}{suffix} ~ {high:.2f}{suffix}"
+
+        self.ranking_progress.stop()
+        
         # 刷新评分排行榜
         self.rating_tree.delete(*self.rating_tree.get_children())
-        
-        # 计算所有玩家的rating
-        player_ratings = []
-        for player in self.players:
-            rating, total_games, wins = self.calculate_rating(player['name'])
-            player_ratings.append({
-                'name': player['name'],
-                'rating': rating,
-                'total_games': total_games,
-                'wins': wins
-            })
-        
+
         # 按rating排序
-        player_ratings.sort(key=lambda x: x['rating'], reverse=True)
+        player_ratings = sorted(leaderboard.values(), key=lambda x: x['rating'], reverse=True)
         
         # 添加到评分排行榜
         for i, player_data in enumerate(player_ratings, 1):
@@ -383,6 +3203,8 @@ class GameScoreSystem:
                 i,
                 player_data['name'],
                 f"{player_data['rating']:.2f}",
+                interval_text(player_data['name'], 'rating'),
+                f"{player_data['elo']:.0f}",
                 player_data['total_games'],
                 player_data['wins']
             ))
@@ -390,18 +3212,8 @@ class GameScoreSystem:
         # 刷新排名百分比排行榜
         self.rank_percentage_tree.delete(*self.rank_percentage_tree.get_children())
         
-        # 计算所有玩家的平均排名百分比
-        player_rank_percentages = []
-        for player in self.players:
-            avg_rank_percentage, total_games = self.calculate_avg_rank_percentage(player['name'])
-            player_rank_percentages.append({
-                'name': player['name'],
-                'avg_rank_percentage': avg_rank_percentage,
-                'total_games': total_games
-            })
-        
         # 按平均排名百分比排序
-        player_rank_percentages.sort(key=lambda x: x['avg_rank_percentage'], reverse=True)
+        player_rank_percentages = sorted(leaderboard.values(), key=lambda x: x['avg_rank_percentage'], reverse=True)
         
         # 添加到排名百分比排行榜
         for i, player_data in enumerate(player_rank_percentages, 1):
@@ -409,52 +3221,71 @@ class GameScoreSystem:
                 i,
                 player_data['name'],
                 f"{player_data['avg_rank_percentage']:.2f}%",
+                interval_text(player_data['name'], 'avg_rank_percentage', '%'),
                 player_data['total_games']
             ))
 
-    def calculate_rating(self, player_name):
-        """计算玩家的rating"""
-        # 初始化各人数游戏的获胜次数
-        wins_by_player_count = {3: 0, 4: 0, 5: 0, 6: 0, 7: 0}
-        total_games = 0
-        
-        # 遍历所有游戏记录
-        for game in self.games:
-            # 检查玩家是否参加了这场游戏
-            if player_name in game['scores']:
-                total_games += 1
-                
-                # 检查玩家是否获胜
-                if game['winner'] == player_name:
-                    player_count = int(game['player_count'])
-                    wins_by_player_count[player_count] += 1
-        # 计算rating
-        weighted_wins = 0
-        for player_count, wins in wins_by_player_count.items():
-            weighted_wins += wins * player_count
-
-        # 避免除以零
-        if total_games == 0:
-            return 0, total_games, sum(wins_by_player_count.values())
-        rating = weighted_wins / total_games
-        return rating, total_games, sum(wins_by_player_count.values())
-    
+    @instrumented
     def refresh_player_list(self):
         """刷新玩家列表"""
+        if not hasattr(self, 'player_tree'):
+            return
         self.player_tree.delete(*self.player_tree.get_children())
         for player in self.players:
             self.player_tree.insert("", "end", values=(player['id'], player['name']))
+        self.undo_delete_button.state(['!disabled'] if self.deleted_players else ['disabled'])
     
+    def history_values(self, game):
+        """历史记录中一行的显示内容，不显示已删除的玩家"""
+        visible = self.player_index.visible_scores(game)
+        players = ", ".join(visible.keys())
+        scores = ", ".join([str(score) for score in visible.values()])
+        winner = game['winner']
+        if game.winner_id in self.player_index.tombstones:
+            # 与清除后重新确定的胜者一致
+            winner = max(visible.items(), key=lambda x: x[1])[0] if visible else "无"
+        return (game['date'], game['player_count'], players, scores, winner)
+    
+    @instrumented
     def refresh_history(self):
-        """刷新历史记录"""
+        """刷新历史记录：只加载最新的一页，滚动到底部附近时再加载更多"""
+        if not hasattr(self, 'history_tree'):
+            return
         self.history_tree.delete(*self.history_tree.get_children())
-        for game in reversed(self.games):
-            players = ", ".join(game['scores'].keys())
-            scores = ", ".join([str(score) for score in game['scores'].values()])
-            self.history_tree.insert( "", "end", values=(game['date'], game['player_count'], players, scores, game['winner']) )
+        # 已加载的记录数（从最新的一局往前数）
+        self.history_loaded = 0
+        self.history_loading = False
+        self.load_more_history()
+    
+    @instrumented
+    def load_more_history(self):
+        """按从新到旧的顺序追加一页历史记录"""
+        self.history_loading = False
+        end = len(self.games) - self.history_loaded
+        start = max(0, end - self.history_page_size)
+        for game in reversed(self.games[start:end]):
+            self.history_tree.insert("", "end", values=self.history_values(game))
+        self.history_loaded += end - start
+    
+    def prepend_history(self, game):
+        """把新记录插入到历史记录顶部，不重建其余行"""
+        if not hasattr(self, 'history_tree'):
+            return
+        self.history_tree.insert("", 0, values=self.history_values(game))
+        self.history_loaded += 1
+    
+    def on_history_scroll(self, first, last):
+        """历史记录滚动时更新滚动条，接近底部且还有未加载的记录时加载下一页"""
+        self.history_scrollbar.set(first, last)
+        if float(last) > 0.9 and self.history_loaded < len(self.games) and not self.history_loading:
+            self.history_loading = True
+            self.root.after_idle(self.load_more_history)
     
+    @instrumented
     def refresh_analysis_players(self):
         """刷新分析选项卡中的玩家列表"""
+        if not hasattr(self, 'analysis_player_combo'):
+            return
         player_names = [player['name'] for player in self.players]
         self.analysis_player_combo['values'] = player_names
         if player_names:
@@ -475,6 +3306,8 @@ class GameScoreSystem:
     
     def update_player_selection(self):
         """更新玩家选择区域"""
+        if not hasattr(self, 'player_select_frame'):
+            return
         # 清除现有组件
         for widget in self.player_select_frame.winfo_children():
             widget.destroy()
@@ -529,11 +3362,16 @@ class GameScoreSystem:
             if player['name'].lower() == name.lower():
                 messagebox.showerror("错误", f"玩家 {name} 已存在")
                 return
+        # 与已删除的玩家重名时，先把旧玩家从记录中清除，避免新玩家继承旧记录
+        if any(deleted.lower() == name.lower() for deleted in self.deleted_players):
+            self.compact_players()
         
         # ID生成
         try:
             # 尝试获取现有ID的最大值
-            existing_ids = [int(p['id']) for p in self.players if p['id'].isdigit()]
+            # 已删除但可撤销的玩家的ID不能重复使用
+            deleted = [player for _, player in self.deleted_players.values()]
+            existing_ids = [int(p['id']) for p in self.players + deleted if p['id'].isdigit()]
             new_id = max(existing_ids, default=0) + 1
         except (ValueError, KeyError):
             # 如果出现错误，从1开始
@@ -545,7 +3383,10 @@ class GameScoreSystem:
             'name': name
         }
         
-        self.players.append(new_player)
+        with self._data_lock:
+            self.players.append(new_player)
+            # 排行榜和置信区间包含玩家列表中的全部玩家，缓存的结果随之失效
+            self.data_version += 1
         self.save_players()
         self.player_name_var.set("")
         messagebox.showinfo("成功", f"玩家 {name} 添加成功")
@@ -557,43 +3398,88 @@ class GameScoreSystem:
         if hasattr(self, 'player_name_entry'):
             self.player_name_entry.focus_set()
     
-    def delete_player(self):
-        """删除选中玩家"""
+    def delete_selected_player(self):
+        """删除选中玩家：立即从界面中移除，稍后在后台清除其记录并保存，期间可以撤销"""
         selected = self.player_tree.selection()
         if not selected:
             messagebox.showerror("错误", "请先选择要删除的玩家")
             return
         
-        # 获取选中玩家的ID和名称
+        # 获取选中玩家的名称
         item = self.player_tree.item(selected[0])
-        player_id = item['values'][0]
-        player_name = item['values'][1]
+        player_name = str(item['values'][1])
         
         if messagebox.askyesno("确认", f"确定要删除玩家 {player_name} 吗？"):
-            # 删除玩家
-            self.players = [p for p in self.players if p['id'] != player_id]
-            
-            # 更新游戏记录，移除该玩家的分数
-            for game in self.games:
-                if player_name in game['scores']:
-                    del game['scores'][player_name]
-                    # 如果胜者是该玩家，需要重新计算胜者
-                    if game['winner'] == player_name:
-                        if game['scores']:
-                            game['winner'] = max(game['scores'].items(), key=lambda x: x[1])[0]
-                        else:
-                            game['winner'] = "无"
-            
-            self.save_players()
-            self.save_games()
-            messagebox.showinfo("成功", f"玩家 {player_name} 已删除")
-            
-            # 刷新所有相关界面
-            self.refresh_player_list()
-            self.update_player_selection()
-            self.refresh_history()
-            self.refresh_analysis_players()
-            self.refresh_ranking()
+            self.delete_player(player_name)
+            # 先保存删除标记，之后保存的玩家列表中不再有该玩家
+            self.save_deleted_players()
+            self.schedule_compaction()
+            self.refresh_player_views()
+            messagebox.showinfo("成功", f"玩家 {player_name} 已删除，可以点击“撤销删除”恢复")
+    
+    def undo_delete(self):
+        """恢复最近删除的玩家"""
+        player_name = self.undo_delete_player()
+        if player_name is None:
+            messagebox.showinfo("提示", "没有可以撤销的删除")
+            return
+        # 玩家列表可能已在删除后保存过，先恢复玩家列表再去掉删除标记
+        self.save_players()
+        self.save_deleted_players()
+        self.refresh_player_views()
+        messagebox.showinfo("成功", f"玩家 {player_name} 已恢复")
+    
+    def schedule_compaction(self):
+        """推迟清除已删除的玩家，连续删除时只在最后一次删除后执行一次"""
+        if self.compaction_job is not None:
+            self.root.after_cancel(self.compaction_job)
+        self.compaction_job = self.root.after(self.compaction_delay, self.start_compaction)
+    
+    def start_compaction(self):
+        """在后台线程准备清除已删除的玩家，完成后在界面线程换入数据、保存并刷新统计"""
+        self.compaction_job = None
+        if not self.deleted_players:
+            return
+        self.worker.submit('compaction', self.prepare_compaction, (list(self.deleted_players),),
+                           callback=self.finish_compaction, on_error=self.show_save_error)
+    
+    def finish_compaction(self, compaction):
+        """换入后台准备好的清除结果；准备期间数据被重新加载或撤销了删除时按当前的已删除玩家重新清除"""
+        player_names = self.apply_compaction(compaction)
+        if player_names is None:
+            self.start_compaction()
+            return
+        self.save_compaction(player_names)
+    
+    def compact_players(self):
+        """立即在界面线程清除已删除的玩家（关闭窗口、重新添加同名玩家时），在后台保存并刷新统计"""
+        if self.compaction_job is not None:
+            self.root.after_cancel(self.compaction_job)
+            self.compaction_job = None
+        # 正在准备的清除结果不再需要
+        self.worker.cancel('compaction')
+        player_names = super().compact_players()
+        if player_names:
+            self.save_compaction(player_names)
+        return player_names
+    
+    def save_compaction(self, player_names):
+        """清除玩家之后在后台保存，并刷新统计"""
+        self.save_players()
+        self.remove_player_games(player_names)
+        # 游戏记录保存之后才去掉删除标记
+        self.save_deleted_players()
+        # 其他玩家的名次和胜局因清除而变化
+        self.refresh_player_views()
+    
+    def refresh_player_views(self):
+        """玩家增删后刷新所有相关界面"""
+        self.refresh_player_list()
+        self.update_player_selection()
+        self.refresh_history()
+        self.refresh_analysis_players()
+        self.refresh_ranking()
+        self.refresh_head_to_head()
     
     def save_record(self):
         """保存游戏记录"""
@@ -643,12 +3529,13 @@ class GameScoreSystem:
             'winner': winner
         }
         
-        self.games.append(new_game)
-        self.save_games()
+        new_game = self.add_game(new_game)
+        self.append_game(new_game)
         messagebox.showinfo("成功", "游戏记录保存成功")
         self.clear_input()
-        self.refresh_history()
+        self.prepend_history(new_game)
         self.refresh_ranking()  # 刷新排行榜
+        self.refresh_head_to_head()
         
     def choose_winner_dialog(self, candidate_winners):
         """当有多个玩家获得最高分时，弹出对话框让用户选择赢家"""
@@ -717,134 +3604,149 @@ class GameScoreSystem:
             messagebox.showerror("错误", "请选择玩家")
             return
         
-        # 获取玩家的所有游戏记录
-        player_games = []
-        for game in self.games:
-            if player_name in game['scores']:
-                player_games.append(game)
+        # 数据没有变化时直接使用缓存的报告和图像
+        key = (player_name, self.data_version)
+        if key in self.chart_cache:
+            instrumentation.count('chart_cache.hit')
+            self.chart_cache.move_to_end(key)
+            self.worker.cancel('report')
+            self.show_report(player_name, self.chart_cache[key]['report'], key)
+            return
         
-        if not player_games:
+        instrumentation.count('chart_cache.miss')
+        # 在后台生成报告，重复点击时只显示最后一次的结果
+        self.analysis_progress.start()
+        self.worker.submit('report', self.cached_report, (player_name,),
+                           callback=lambda report: self.show_report(player_name, report, key),
+                           on_error=self.show_report_error)
+    
+    def show_report_error(self, error):
+        """报告生成失败时提示"""
+        self.analysis_progress.stop()
+        messagebox.showerror("错误", f"生成报告时出错: {str(error)}")
+    
+    def show_report(self, player_name, report, key=None):
+        """显示玩家报告和图表"""
+        self.analysis_progress.stop()
+        if key is not None:
+            entry = self.cache_report(key, report)
+        else:
+            entry = {'report': report, 'image': None}
+        if report is None:
             self.analysis_text.delete(1.0, tk.END)
             self.analysis_text.insert(tk.END, f"玩家 {player_name} 暂无游戏记录")
+            self.clear_report_chart()
             return
         
-        # 提取数据
-        dates = [game['date'] for game in player_games]
-        scores = [game['scores'][player_name] for game in player_games]
-        is_winner = [1 if game['winner'] == player_name else 0 for game in player_games]
-        player_counts = [game['player_count'] for game in player_games]
-        
-        # 计算统计信息
-        total_games = len(player_games)
-        wins = sum(is_winner)
-        win_rate = wins / total_games * 100 if total_games > 0 else 0
-        avg_score = sum(scores) / total_games if total_games > 0 else 0
-        max_score = max(scores) if scores else 0
-        min_score = min(scores) if scores else 0
-        
-        # 计算排名百分比
-        rank_percentages = []
-        for game in player_games:
-            player_count = int(game['player_count'])
-            player_score = game['scores'][player_name]
-            
-            # 获取该游戏中所有分数
-            game_scores = list(game['scores'].values())
-            # 计算排名百分比
-            sorted_scores = sorted(game_scores, reverse=True)
-            rank = sorted_scores.index(player_score) + 1
-            rank_percentage = (player_count - rank) / (player_count - 1) * 100 if player_count > 1 else 100
-            rank_percentages.append(rank_percentage)
-        
-        avg_rank_percentage = sum(rank_percentages) / len(rank_percentages) if rank_percentages else 0
-        
-        # 计算rating
-        rating, total_games_calc, wins_calc = self.calculate_rating(player_name)
-        
-        # 显示统计信息
-        report_text = f"""
-玩家: {player_name}
-总游戏场次: {total_games}
-获胜场次: {wins}
-胜率: {win_rate:.2f}%
-平均得分: {avg_score:.2f}
-最高得分: {max_score}
-最低得分: {min_score}
-平均排名百分比(100%为第一名，0%为最后一名): {avg_rank_percentage:.2f}%
-评分(Rating): {rating:.2f}
-
-最近5场游戏记录:
-"""
-        # 添加最近5场游戏记录
-        recent_games = player_games[-5:] if len(player_games) > 5 else player_games
-        for game in recent_games:
-            report_text += f"{game['date']}: 得分 {game['scores'][player_name]}, 排名 {sorted(list(game['scores'].values()), reverse=True).index(game['scores'][player_name]) + 1}/{game['player_count']}, {'获胜' if game['winner'] == player_name else '未获胜'}\n"
-        
-        # 显示全局统计
-        report_text += f"\n全局统计:\n"
-        report_text += f"总游戏局数: {len(self.games)}\n"
-        
-        # 计算最高分和最低分
-        all_scores = []
-        for game in self.games:
-            all_scores.extend(game['scores'].values())
-        
-        if all_scores:
-            report_text += f"全系统最高分: {max(all_scores)}\n"
-            report_text += f"全系统最低分: {min(all_scores)}\n"
-        
-        # 添加图表显示条件
-        if total_games < 5:
-            report_text += f"\n注意: 由于玩家 {player_name} 只参加了 {total_games} 场游戏，不足5场，因此不显示分析图表。"
-        
+        total_games = report['summary']['total_games']
         self.analysis_text.delete(1.0, tk.END)
-        self.analysis_text.insert(tk.END, report_text)
+        self.analysis_text.insert(tk.END, report['text'])
         
         # 只在参与场次大于等于5场时才显示图表
         if total_games >= 5:
-            # 创建图表
-            plt.figure(figsize=(10, 8))
-            
-            # 分数变化图
-            plt.subplot(2, 1, 1)
-            # 使用游戏序号而不是日期作为X轴
-            game_numbers = list(range(1, total_games + 1))
-            plt.plot(game_numbers, scores, 'o-', label='分数')
-            plt.title(f'{player_name} 的分数变化')
-            plt.xlabel('游戏序号')
-            plt.ylabel('分数')
-            plt.ylim(min(all_scores) - 1, max(all_scores) + 1)
-            plt.grid(True)
-            
-            # 标记获胜的游戏
-            win_games = [i+1 for i in range(total_games) if is_winner[i]]
-            win_scores = [scores[i] for i in range(total_games) if is_winner[i]]
-            plt.plot(win_games, win_scores, 'ro', label='获胜')
-            
-            plt.legend()
-            
-            # 排名百分比图
-            plt.subplot(2, 1, 2)
-            plt.plot(game_numbers, rank_percentages, 'o-', color='green')
-            plt.title(f'{player_name} 的排名百分比变化')
-            plt.xlabel('游戏序号')
-            plt.ylabel('排名百分比 (%)')
-            plt.ylim(-5, 105)
-            plt.grid(True)
-            plt.axhline(y=avg_rank_percentage, color='r', linestyle='--', label=f'平均: {avg_rank_percentage:.2f}%')
-            plt.legend()
-            
-            plt.tight_layout()
-            plt.show()
+            self.draw_report(entry)
         else:
+            self.clear_report_chart()
             # 如果不足5场，显示提示信息
             messagebox.showinfo("提示", f"玩家 {player_name} 只参加了 {total_games} 场游戏，不足5场，因此不显示分析图表。")
     
+    def cache_report(self, key, report):
+        """把报告放入LRU缓存，超出容量时丢弃最久未查看的玩家"""
+        # 数据版本变化后旧条目不会再被命中，顺便清理
+        for stale in [k for k in self.chart_cache if k[1] != key[1]]:
+            del self.chart_cache[stale]
+        entry = self.chart_cache.get(key)
+        if entry is None or entry['report'] is not report:
+            entry = {'report': report, 'image': None}
+            self.chart_cache[key] = entry
+        self.chart_cache.move_to_end(key)
+        while len(self.chart_cache) > self.chart_cache_size:
+            self.chart_cache.popitem(last=False)
+        return entry
+    
+    def create_report_canvas(self):
+        """在分析选项卡中创建图表画布（此时才导入 matplotlib）"""
+        import_matplotlib()
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        self.report_chart = ReportChart(Figure(figsize=(10, 8)))
+        self.report_canvas = FigureCanvasTkAgg(self.report_chart.fig, master=self.analysis_frame)
+        self.report_canvas.get_tk_widget().pack(fill='both', expand=True, padx=10, pady=5)
+        # 画布刚放入窗口，先让它获得实际尺寸再绘制
+        self.root.update_idletasks()
+    
+    def clear_report_chart(self):
+        """清空图表；画布尚未创建时无需处理"""
+        if self.report_canvas is None:
+            return
+        self.report_chart.clear()
+        self.report_canvas.draw_idle()
+    
+    @instrumented
+    def draw_report(self, entry):
+        """更新图表；画布尺寸未变时直接贴回缓存的图像，否则重新渲染并缓存"""
+        if self.report_canvas is None:
+            self.create_report_canvas()
+        # 线条数据总是同步更新，之后窗口缩放触发重绘时内容仍然正确
+        self.report_chart.update(entry['report'])
+        size = self.report_canvas.get_width_height()
+        image = entry['image']
+        if image is not None and image[0] == size:
+            instrumentation.count('chart.blit')
+            self.report_canvas.restore_region(image[1])
+            self.report_canvas.blit(self.report_chart.fig.bbox)
+            return
+        instrumentation.count('chart.render')
+        self.report_canvas.draw()
+        entry['image'] = (size, self.report_canvas.copy_from_bbox(self.report_chart.fig.bbox))
+    
     def run(self):
         """运行应用程序"""
         self.root.mainloop()
 
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="桌游积分管理系统")
+    parser.add_argument('--sqlite', metavar='DB', help="使用SQLite数据库存储数据")
+    parser.add_argument('--migrate-sqlite', metavar='DB',
+                        help="把 players.csv 和 games.csv 导入SQLite数据库后退出")
+    parser.add_argument('--tie-rule', choices=TIE_RULES, default='competition',
+                        help="同分时的名次规则：competition 并列取最高名次，winner 并列第一时只有胜者排第一")
+    parser.add_argument('--analytics', choices=('python', 'numpy'), default='python',
+                        help="统计引擎：python 为增量统计，numpy 为向量化统计（需要安装 numpy）")
+    parser.add_argument('--batch', metavar='DIR',
+                        help="不打开界面，把所有玩家的报告和图表输出到目录后退出")
+    parser.add_argument('--workers', type=int, help="批处理渲染图表和计算置信区间的进程数，默认为CPU核数")
+    parser.add_argument('--bootstrap-resamples', type=int, default=ScoreData.bootstrap_resamples,
+                        help="计算Rating和平均排名百分比置信区间的bootstrap重抽样次数，0为不计算")
+    parser.add_argument('--bootstrap-seed', type=int, default=ScoreData.bootstrap_seed,
+                        help="bootstrap重抽样的随机种子，相同种子的结果相同")
+    parser.add_argument('--follow', action='store_true',
+                        help="跟随模式：界面打开期间定期读取其他程序追加到 games.csv 的记录")
+    parser.add_argument('--instrument', action='store_true',
+                        help="启动时开启耗时统计；批处理时把统计写入输出目录的 diagnostics.json")
+    args = parser.parse_args(argv)
+    instrumentation.enabled = args.instrument
+    ScoreData.bootstrap_resamples = args.bootstrap_resamples
+    ScoreData.bootstrap_seed = args.bootstrap_seed
+    ScoreData.bootstrap_workers = args.workers
+
+    if args.migrate_sqlite:
+        player_total, game_total = migrate_csv_to_sqlite(args.migrate_sqlite)
+        print(f"已导入 {player_total} 名玩家、{game_total} 局游戏到 {args.migrate_sqlite}")
+        return
+
+    storage = SqliteStorage(args.sqlite) if args.sqlite else CsvStorage()
+    if args.batch:
+        report_total, chart_total = run_batch(args.batch, storage, args.tie_rule, args.analytics, args.workers)
+        print(f"已生成 {report_total} 份报告、{chart_total} 张图表到 {args.batch}")
+        if args.instrument:
+            instrumentation.dump_json(os.path.join(args.batch, "diagnostics.json"))
+        return
+    
+    app = GameScoreSystem(storage, args.tie_rule, args.analytics, args.follow)
+    app.run()
+
 # 运行应用程序
 if __name__ == "__main__":
-    app = GameScoreSystem()
-    app.run()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+比较两种统计引擎在大规模历史记录上的耗时，并校验结果一致（浮点数允许舍入误差）：
+纯Python的 LeaderboardStats（逐局累计）与 NumPy 的 NumpyAnalytics（整体归约）。
+
+用法: python benchmarks/bench_analytics.py [--games 1000000]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Boardgame_management import (GameRecord, LeaderboardStats, NumpyAnalytics, PlayerGameIndex, PlayerRegistry,
+                                  rank_game)
+from bench_load_games import make_games
+
+
+def python_summaries(registry, games, player_names):
+    """纯Python路径：与 GameScoreSystem.player_summary 的计算方式相同"""
+    stats = LeaderboardStats(registry, games)
+    index = PlayerGameIndex(registry, games)
+    summaries = {}
+    for player_name in player_names:
+        player_id = registry.get(player_name)
+        scores = [game.scores[game.seat(player_id)] for game in index.player_games(games, player_name)]
+        rating, total_games, wins = stats.rating(player_name)
+        avg_rank_percentage, _ = stats.avg_rank_percentage(player_name)
+        summaries[player_name] = {
+            'total_games': total_games,
+            'wins': wins,
+            'win_rate': wins / total_games * 100,
+            'avg_score': sum(scores) / total_games,
+            'max_score': max(scores),
+            'min_score': min(scores),
+            'avg_rank_percentage': avg_rank_percentage,
+            'rating': rating
+        }
+    return stats.leaderboard(player_names), summaries
+
+
+def numpy_summaries(registry, games, player_names):
+    engine = NumpyAnalytics(registry, games)
+    summaries = {player_name: engine.player_summary(player_name) for player_name in player_names}
+    return engine.leaderboard(player_names), summaries
+
+
+def results_match(expected, actual):
+    """逐项比较两个结果，浮点数允许相对误差 1e-9"""
+    if isinstance(expected, dict):
+        return (isinstance(actual, dict) and expected.keys() == actual.keys()
+                and all(results_match(expected[key], actual[key]) for key in expected))
+    if isinstance(expected, (list, tuple)):
+        return len(expected) == len(actual) and all(map(results_match, expected, actual))
+    if isinstance(expected, float) or isinstance(actual, float):
+        return math.isclose(expected, actual, rel_tol=1e-9, abs_tol=1e-9)
+    return expected == actual
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--games', type=int, default=1000000, help="对局数量")
+    args = parser.parse_args()
+
+    registry = PlayerRegistry()
+    games = [rank_game(GameRecord.from_dict(game, registry)) for game in make_games(args.games)]
+    player_names = sorted(registry.names)
+
+    python_time, python_result = timed(python_summaries, registry, games, player_names)
+    numpy_time, numpy_result = timed(numpy_summaries, registry, games, player_names)
+
+    assert results_match(python_result, numpy_result), "两种统计引擎的结果不一致"
+    print(f"对局数: {args.games}，玩家数: {len(player_names)}")
+    print(f"纯Python统计: {python_time:.2f}s")
+    print(f"NumPy统计:    {numpy_time:.2f}s  ({python_time / numpy_time:.1f}x)")
+    print("结果一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+测量Elo评分的全量计算和增量更新耗时，并校验增量结果与全量计算一致。
+
+用法: python benchmarks/bench_elo.py [--games 1000000] [--incremental 10000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Boardgame_management import EloRatings, GameRecord, PlayerRegistry, rank_game
+from generate_data import iter_games, player_names
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--games', type=int, default=1000000, help="对局数量")
+    parser.add_argument('--incremental', type=int, default=10000, help="最后逐局增量加入的对局数量")
+    parser.add_argument('--players', type=int, default=30, help="玩家总数")
+    args = parser.parse_args()
+
+    names = player_names(args.players)
+    registry = PlayerRegistry(names)
+    games = [rank_game(GameRecord.from_dict(game, registry)) for game in iter_games(args.games, names)]
+
+    full_time, full = timed(EloRatings, registry, games)
+
+    # 先计算前面的记录，再像保存新记录一样逐局加入剩下的
+    split = len(games) - args.incremental
+    played = games[:split]
+    elo = EloRatings(registry, played)
+    start = time.perf_counter()
+    for game in games[split:]:
+        played.append(game)
+        elo.catch_up(played)
+    incremental_time = time.perf_counter() - start
+
+    assert not elo.stale
+    for name in names:
+        assert abs(elo.rating(name)[0] - full.rating(name)[0]) < 1e-6, name
+
+    print(f"对局数: {args.games}")
+    print(f"全量计算:         {full_time:.2f}s  ({full_time / args.games * 1e6:.1f}µs/局)")
+    print(f"逐局增量更新:     {incremental_time / args.incremental * 1e6:.1f}µs/局")
+    top = sorted(names, key=lambda name: full.rating(name)[0], reverse=True)[:5]
+    print("最高评分: " + ", ".join(f"{name} {full.rating(name)[0]:.0f}" for name in top))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+比较 games.csv 两种分数编码的加载速度：
+旧版 eval() 逐行解析 Python 字典 与 当前的 JSON 流式解析。
+
+用法: python benchmarks/bench_load_games.py [--games 1000000]
+"""
+
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Boardgame_management import CsvGameStore, GAME_FIELDNAMES
+
+
+def make_games(count, seed=0):
+    """生成随机对局记录"""
+    rng = random.Random(seed)
+    names = [f"玩家{i}" for i in range(30)]
+    games = []
+    for i in range(count):
+        player_count = rng.randint(3, 7)
+        scores = {name: rng.randint(20, 80) for name in rng.sample(names, player_count)}
+        winner = max(scores.items(), key=lambda x: x[1])[0]
+        games.append({'date': f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+                      'player_count': player_count, 'scores': scores, 'winner': winner})
+    return games
+
+
+def write_legacy(path, games):
+    """按旧格式（v1，分数列为字典的repr）写文件"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=GAME_FIELDNAMES[1])
+        writer.writeheader()
+        for game in games:
+            writer.writerow(dict(game, scores=str(game['scores'])))
+
+
+def load_with_eval(path):
+    """旧版 load_games 的解析方式"""
+    games = []
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            row['scores'] = eval(row['scores'])
+            row['player_count'] = int(row['player_count'])
+            games.append(row)
+    return games
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--games', type=int, default=1000000, help="对局数量")
+    args = parser.parse_args()
+
+    games = make_games(args.games)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_file = os.path.join(tmp_dir, "legacy.csv")
+        current_file = os.path.join(tmp_dir, "games.csv")
+        write_legacy(legacy_file, games)
+        CsvGameStore(current_file).save(games)
+        # save 同时生成二进制快照，删除后才是真正解析CSV
+        os.remove(current_file + ".snapshot")
+
+        eval_time, eval_games = timed(load_with_eval, legacy_file)
+        json_time, json_games = timed(CsvGameStore(current_file).load)
+        # 读取旧格式并迁移（只会发生一次）
+        migrate_time, migrated_games = timed(CsvGameStore(legacy_file).load)
+
+    assert eval_games == json_games == migrated_games
+    print(f"对局数: {args.games}")
+    print(f"旧版 eval 解析:      {eval_time:.2f}s")
+    print(f"JSON 流式解析:       {json_time:.2f}s  ({eval_time / json_time:.1f}x)")
+    print(f"旧格式读取并迁移:    {migrate_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
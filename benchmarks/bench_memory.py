@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+测量内存中每局游戏记录占用的字节数：
+以名称为键的字典记录（每局的 scores/ranks/rank_percentages 各一个字典）与紧凑的 GameRecord
+（玩家编号、分数和名次存放在元组中）对比。两者都从同一份 games.csv 加载并计算名次，
+只统计加载完成后仍被记录引用的内存。
+
+用法: python benchmarks/bench_memory.py [--games 100000]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Boardgame_management import CsvStorage, GameRecord, PlayerRegistry, rank_game
+from generate_data import write_dataset
+
+
+def dict_games(storage):
+    """字典记录：加载结果原样保存，名次和排名百分比也以名称为键"""
+    games = storage.load_games()
+    for game in games:
+        record = rank_game(GameRecord.from_dict(game, PlayerRegistry()))
+        game['ranks'] = record['ranks']
+        game['rank_percentages'] = record['rank_percentages']
+    return games
+
+
+def record_games(storage):
+    """GameRecord：与 ScoreData 加载时相同"""
+    registry = PlayerRegistry()
+    return [rank_game(GameRecord.from_dict(game, registry)) for game in storage.load_games()]
+
+
+def retained_bytes(func, *args):
+    """func 返回的对象在加载完成后占用的内存"""
+    gc.collect()
+    tracemalloc.start()
+    result = func(*args)
+    gc.collect()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--games', type=int, default=100000, help="对局数量")
+    parser.add_argument('--players', type=int, default=30, help="玩家总数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        players_file, games_file = write_dataset(tmp_dir, args.games, args.players)
+        storage = CsvStorage(players_file, games_file)
+        # 第一次加载生成快照，之后两种方式都从快照加载
+        storage.load_games()
+        dict_bytes = retained_bytes(dict_games, storage)
+        record_bytes = retained_bytes(record_games, storage)
+
+    print(f"对局数: {args.games}")
+    print(f"字典记录:    {dict_bytes / 1024 ** 2:8.1f}MB  {dict_bytes / args.games:6.0f}字节/局")
+    print(f"GameRecord:  {record_bytes / 1024 ** 2:8.1f}MB  {record_bytes / args.games:6.0f}字节/局"
+          f"  ({dict_bytes / record_bytes:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
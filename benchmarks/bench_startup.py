@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+测量启动耗时：
+1. 用 python -X importtime 统计导入 Boardgame_management 的耗时及最慢的依赖模块；
+2. 在新进程中创建 GameScoreSystem 直到主窗口第一次绘制完成的耗时（需要图形界面环境）。
+
+用法: python benchmarks/bench_startup.py [--games 10000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from Boardgame_management import CsvStorage
+from bench_load_games import make_games
+
+# 在子进程中执行：从导入模块开始计时，到主窗口完成第一次绘制为止
+FIRST_WINDOW_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import Boardgame_management as bgm
+imported = time.perf_counter()
+app = bgm.GameScoreSystem(storage=bgm.CsvStorage({players!r}, {games!r}))
+app.root.update()
+shown = time.perf_counter()
+app.root.destroy()
+print(json.dumps({{'import': imported - start, 'window': shown - start,
+                   'modules': sorted(m for m in ('matplotlib', 'numpy') if m in sys.modules)}}))
+"""
+
+
+def import_times():
+    """返回 (模块总耗时, [(累计耗时, 模块名), ...])，单位为秒"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import Boardgame_management'],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    total, modules = 0, []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        seconds = int(cumulative) / 1e6
+        if name.strip() == 'Boardgame_management':
+            total = seconds
+        # 只统计被本模块直接导入的模块（缩进两个空格）
+        elif name.startswith('   ') and not name.startswith('    '):
+            modules.append((seconds, name.strip()))
+    return total, sorted(modules, reverse=True)
+
+
+def first_window_times(players_file, games_file, repeat):
+    """多次启动应用，返回每次的测量结果；没有图形界面时返回None"""
+    script = FIRST_WINDOW_SCRIPT.format(root=ROOT, players=players_file, games=games_file)
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True)
+        if result.returncode != 0:
+            print(result.stderr.strip().splitlines()[-1])
+            return None
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--games', type=int, default=10000, help="对局数量")
+    parser.add_argument('--repeat', type=int, default=5, help="重复启动次数，取中位数")
+    args = parser.parse_args()
+
+    total, modules = import_times()
+    print(f"导入 Boardgame_management: {total * 1000:.1f}ms")
+    for seconds, name in modules[:8]:
+        print(f"  {name:<24} {seconds * 1000:.1f}ms")
+
+    games = make_games(args.games)
+    players = sorted({name for game in games for name in game['scores']})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage = CsvStorage(os.path.join(tmp_dir, "players.csv"), os.path.join(tmp_dir, "games.csv"))
+        storage.save_players([{'id': str(i), 'name': name} for i, name in enumerate(players, 1)])
+        storage.save_games(games)
+        runs = first_window_times(storage.players_file, storage.games_file, args.repeat)
+
+    if runs is None:
+        print("无法创建窗口（没有图形界面环境？），跳过首个窗口耗时测量")
+        return
+    print(f"对局数: {args.games}")
+    print(f"导入耗时中位数:       {statistics.median(run['import'] for run in runs) * 1000:.1f}ms")
+    print(f"首个窗口耗时中位数:   {statistics.median(run['window'] for run in runs) * 1000:.1f}ms")
+    print(f"启动后已导入的重量级模块: {', '.join(runs[0]['modules']) or '无'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+GameScoreSystem 的性能测试套件。
+
+用 generate_data.py 生成指定规模的数据，然后在不创建窗口的情况下（Tk 控件、对话框和后台线程
+都换成同步执行的替身）直接调用 GameScoreSystem 的方法，记录每个场景的耗时和峰值内存。
+结果可以保存为基准，之后的运行与基准对比，耗时超过基准一定比例时以非零状态退出。
+
+用法:
+  python benchmarks/bench_suite.py --games 1000 10000 100000
+  python benchmarks/bench_suite.py --games 100000 --save-baseline
+  python benchmarks/bench_suite.py --games 100000 --data-dir /tmp/bgm-data   # 复用已生成的数据
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Boardgame_management as bgm
+from generate_data import write_dataset
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+class TkStub:
+    """代替任意Tk控件或变量：方法调用什么也不做，get/set 保存一个值"""
+
+    def __init__(self, value=None):
+        self.value = value
+
+    def __getattr__(self, name):
+        return self._ignore
+
+    def _ignore(self, *args, **kwargs):
+        return ()
+
+    def __setitem__(self, key, value):
+        pass
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class SelectedRowStub(TkStub):
+    """代替选中了一行的 Treeview"""
+
+    def selection(self):
+        return ('row',)
+
+    def item(self, item_id):
+        return {'values': self.value}
+
+
+class MessageboxStub:
+    """代替 tkinter.messagebox：不弹出对话框，确认类对话框总是回答“是”"""
+
+    @staticmethod
+    def showinfo(*args, **kwargs):
+        pass
+
+    @staticmethod
+    def showerror(*args, **kwargs):
+        pass
+
+    @staticmethod
+    def askyesno(*args, **kwargs):
+        return True
+
+
+class SyncWorker:
+    """代替 BackgroundWorker：在当前线程立即执行任务，出错时直接抛出"""
+
+    def submit(self, name, func, args=(), callback=None, on_error=None):
+        result = func(*args)
+        if callback is not None:
+            callback(result)
+
+    def cancel(self, name):
+        pass
+
+    def wait(self):
+        pass
+
+
+class HeadlessScoreSystem(bgm.GameScoreSystem):
+    """不创建窗口的 GameScoreSystem：数据方法不变，界面控件换成替身"""
+
+    def __init__(self, storage):
+        bgm.ScoreData.__init__(self, storage)
+        self.root = TkStub()
+        self.worker = SyncWorker()
+        self.compaction_job = None
+        # 玩家管理、数据分析和排行榜选项卡用到的控件；游戏记录选项卡视为尚未打开
+        self.player_tree = TkStub()
+        self.undo_delete_button = TkStub()
+        self.analysis_player_var = TkStub()
+        self.analysis_player_combo = TkStub()
+        self.analysis_progress = TkStub()
+        self.analysis_text = TkStub()
+        self.report_chart = None
+        self.report_canvas = None
+        self.chart_cache = OrderedDict()
+        self.rating_tree = TkStub()
+        self.rank_percentage_tree = TkStub()
+        self.ranking_progress = TkStub()
+        self.ranking_pending_label = TkStub()
+        # 排行榜统计全部记录
+        self.ranking_window_var = TkStub("全部")
+        self.ranking_count_var = TkStub(100)
+        self.ranking_count_spin = TkStub()
+        self.ranking_period_var = TkStub('')
+        self.ranking_period_combo = TkStub()
+        self.ranking_ci_var = TkStub(False)
+
+    def create_report_canvas(self):
+        """用 Agg 画布代替嵌入窗口的画布，图表照常渲染"""
+        bgm.import_matplotlib()
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        self.report_chart = bgm.ReportChart(Figure(figsize=(10, 8)))
+        self.report_canvas = FigureCanvasAgg(self.report_chart.fig)
+
+
+def most_active_player(system):
+    """参加局数最多的玩家"""
+    positions = system.player_index.positions
+    return system.registry.names[max(positions, key=lambda player_id: len(positions[player_id]))]
+
+
+def clear_load_caches(system):
+    """删除编码缓存和二进制快照，使 load_games 重新解析CSV"""
+    games_file = system.storage.games_file
+    for suffix in (".snapshot", ".encoding"):
+        if os.path.exists(games_file + suffix):
+            os.remove(games_file + suffix)
+
+
+def select_report_player(system):
+    system.analysis_player_var.set(most_active_player(system))
+    system.chart_cache.clear()
+    system.stats_cache.clear()
+
+
+def clear_stats_cache(system):
+    """测量完整计算的耗时，而不是缓存命中"""
+    system.stats_cache.clear()
+
+
+def select_deleted_player(system):
+    player = next(p for p in system.players if p['name'] == most_active_player(system))
+    system.player_tree = SelectedRowStub([player['id'], player['name']])
+
+
+def all_ratings(system):
+    for player in system.players:
+        system.calculate_rating(player['name'])
+
+
+def all_avg_rank_percentages(system):
+    for player in system.players:
+        system.calculate_avg_rank_percentage(player['name'])
+
+
+# (场景名, 计时前的准备, 被计时的调用, 是否只能执行一次)
+SCENARIOS = [
+    ('load_games (csv)', clear_load_caches, lambda system: system.load_games(), False),
+    ('load_games', None, lambda system: system.load_games(), False),
+    ('save_games', None, lambda system: system.save_games(), False),
+    ('refresh_ranking', clear_stats_cache, lambda system: system.refresh_ranking(), False),
+    ('calculate_rating', clear_stats_cache, all_ratings, False),
+    ('calculate_avg_rank_percentage', clear_stats_cache, all_avg_rank_percentages, False),
+    ('generate_report', select_report_player, lambda system: system.generate_report(), False),
+    # 删除会修改数据，放在最后且只执行一次；删除只记墓碑，清除记录并保存在 compact_players 中
+    ('delete_player', select_deleted_player, lambda system: system.delete_selected_player(), True),
+    ('compact_players', None, lambda system: system.compact_players(), True),
+]
+
+
+def run_scenario(system, setup, func, repeat, measure_memory):
+    """返回 (耗时中位数秒, 峰值内存MB或None)"""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup(system)
+        start = time.perf_counter()
+        func(system)
+        times.append(time.perf_counter() - start)
+    peak = None
+    if measure_memory:
+        if setup is not None:
+            setup(system)
+        tracemalloc.start()
+        func(system)
+        peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def run_suite(data_dir, repeat, measure_memory):
+    """对一份数据运行全部场景，返回 {场景名: {'time': 秒, 'peak_mb': MB}}"""
+    storage = bgm.CsvStorage(os.path.join(data_dir, "players.csv"), os.path.join(data_dir, "games.csv"))
+    system = HeadlessScoreSystem(storage)
+    results = {}
+    for name, setup, func, once in SCENARIOS:
+        if once:
+            # 只能执行一次的场景同时测耗时和内存
+            if setup is not None:
+                setup(system)
+            if measure_memory:
+                tracemalloc.start()
+            start = time.perf_counter()
+            func(system)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2 if measure_memory else None
+            tracemalloc.stop()
+        else:
+            elapsed, peak = run_scenario(system, setup, func, repeat, measure_memory)
+        results[name] = {'time': elapsed, 'peak_mb': peak}
+    return results
+
+
+def print_results(games, results, baseline, threshold):
+    """打印结果表，返回超过基准阈值的场景列表"""
+    regressions = []
+    print(f"\n对局数: {games}")
+    print(f"{'场景':<32}{'耗时':>12}{'峰值内存':>12}{'基准':>12}{'对比':>10}")
+    for name, result in results.items():
+        peak = f"{result['peak_mb']:.1f}MB" if result['peak_mb'] is not None else '-'
+        line = f"{name:<32}{result['time'] * 1000:>10.1f}ms{peak:>12}"
+        base = baseline.get(name)
+        if base:
+            ratio = result['time'] / base['time'] if base['time'] else float('inf')
+            line += f"{base['time'] * 1000:>10.1f}ms{ratio:>9.2f}x"
+            if ratio > threshold:
+                regressions.append((games, name, ratio))
+                line += '  !'
+        print(line)
+    return regressions
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="要测试的对局数量，可指定多个（1000 到 10000000）")
+    parser.add_argument('--players', type=int, default=30, help="玩家总数")
+    parser.add_argument('--seed', type=int, default=0, help="生成数据的随机种子")
+    parser.add_argument('--repeat', type=int, default=3, help="每个场景重复次数，取中位数")
+    parser.add_argument('--no-memory', action='store_true', help="不测量峰值内存（tracemalloc 会明显拖慢大数据量的测试）")
+    parser.add_argument('--data-dir', help="数据目录，每种规模使用其中的 games-<数量> 子目录，已存在时直接复用")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="基准文件路径")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基准")
+    parser.add_argument('--threshold', type=float, default=1.2, help="耗时超过基准的该倍数时视为变慢")
+    args = parser.parse_args()
+
+    # 测试期间不弹出任何对话框
+    bgm.messagebox = MessageboxStub
+    baseline = load_baseline(args.baseline)
+    all_results = {}
+    regressions = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for games in args.games:
+            data_dir = os.path.join(args.data_dir or tmp_dir, f"games-{games}")
+            if not os.path.exists(os.path.join(data_dir, "games.csv")):
+                write_dataset(data_dir, games, args.players, args.seed)
+            # 保存和删除玩家会改写文件，在副本上测试，生成的数据保持不变
+            work_dir = os.path.join(tmp_dir, f"work-{games}")
+            os.makedirs(work_dir)
+            for file_name in ("players.csv", "games.csv"):
+                shutil.copy(os.path.join(data_dir, file_name), work_dir)
+            results = run_suite(work_dir, args.repeat, not args.no_memory)
+            shutil.rmtree(work_dir)
+            all_results[str(games)] = results
+            regressions += print_results(games, results, baseline.get(str(games), {}), args.threshold)
+
+    if args.save_baseline:
+        baseline.update(all_results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"\n已保存基准: {args.baseline}")
+    if regressions:
+        print(f"\n{len(regressions)} 个场景比基准慢 {args.threshold}x 以上")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+生成用于性能测试的 players.csv / games.csv。
+
+同一组参数和种子总是生成完全相同的文件。每局 3 到 7 名玩家，玩家有各自的水平，
+分数围绕水平波动；按 --tie-rate 的比例让最高分出现并列，胜者在并列者中随机选出
+（与界面中手动选择赢家的情况一致）。记录逐条写入文件，可以生成上千万局而不占用大量内存。
+
+用法: python benchmarks/generate_data.py OUT_DIR [--games 100000] [--players 30] [--seed 0]
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Boardgame_management import GAME_FIELDNAMES, SCORES_FORMAT_VERSION
+
+# 第一局的日期，之后的对局在 DAYS_SPAN 天内均匀分布
+START_DATE = date(2015, 1, 1)
+DAYS_SPAN = 3650
+
+
+def player_names(count):
+    """生成玩家名称"""
+    return [f"玩家{i}" for i in range(1, count + 1)]
+
+
+def iter_games(count, names, seed=0, tie_rate=0.1):
+    """按时间顺序逐局生成游戏记录"""
+    rng = random.Random(seed)
+    skills = {name: rng.gauss(50, 8) for name in names}
+    for i in range(count):
+        player_count = rng.randint(3, 7)
+        players = rng.sample(names, player_count)
+        scores = {name: min(100, max(10, round(rng.gauss(skills[name], 10)))) for name in players}
+        if rng.random() < tie_rate:
+            # 让第二名追平最高分
+            ordered = sorted(players, key=scores.get, reverse=True)
+            scores[ordered[1]] = scores[ordered[0]]
+        max_score = max(scores.values())
+        winner = rng.choice([name for name in players if scores[name] == max_score])
+        day = START_DATE + timedelta(days=i * DAYS_SPAN // count)
+        yield {'date': day.strftime("%Y-%m-%d"), 'player_count': player_count,
+               'scores': scores, 'winner': winner}
+
+
+def write_dataset(out_dir, games, players=30, seed=0, tie_rate=0.1):
+    """在 out_dir 中写入 players.csv 和 games.csv（当前格式），返回两个文件的路径"""
+    os.makedirs(out_dir, exist_ok=True)
+    players_file = os.path.join(out_dir, "players.csv")
+    games_file = os.path.join(out_dir, "games.csv")
+    names = player_names(players)
+    with open(players_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['id', 'name'])
+        writer.writeheader()
+        for player_id, name in enumerate(names, 1):
+            writer.writerow({'id': str(player_id), 'name': name})
+    with open(games_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=GAME_FIELDNAMES[SCORES_FORMAT_VERSION])
+        writer.writeheader()
+        for game in iter_games(games, names, seed, tie_rate):
+            writer.writerow({'date': game['date'], 'player_count': game['player_count'],
+                             'scores_json': json.dumps(game['scores'], ensure_ascii=False),
+                             'winner': game['winner']})
+    return players_file, games_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('out_dir', help="输出目录")
+    parser.add_argument('--games', type=int, default=100000, help="对局数量（1000 到 10000000）")
+    parser.add_argument('--players', type=int, default=30, help="玩家总数，至少7人")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--tie-rate', type=float, default=0.1, help="最高分并列的对局比例")
+    args = parser.parse_args()
+    if args.players < 7:
+        parser.error("--players 至少为7")
+
+    players_file, games_file = write_dataset(args.out_dir, args.games, args.players, args.seed, args.tie_rate)
+    print(f"已生成 {players_file} 和 {games_file}（{args.games} 局）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+CsvGameStore 的日志追加、合并、中断恢复和旧格式迁移。
+
+用法: python -m pytest tests
+"""
+
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Boardgame_management import CsvGameStore
+
+
+def make_game(i):
+    return {'date': f"2024-01-{i % 28 + 1:02d}", 'player_count': 2,
+            'scores': {'甲': i, '乙': 100 - i}, 'winner': '甲' if i > 50 else '乙'}
+
+
+class CsvGameStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.games_file = os.path.join(self.tmp_dir, "games.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def store(self):
+        return CsvGameStore(self.games_file)
+
+    def test_append_then_load(self):
+        store = self.store()
+        store.save([make_game(0)])
+        for i in range(1, 4):
+            store.append(make_game(i))
+        self.assertEqual(self.store().load(), [make_game(i) for i in range(4)])
+
+    def test_compaction_merges_journal(self):
+        store = self.store()
+        store.compact_threshold = 3
+        games = []
+        for i in range(3):
+            games.append(make_game(i))
+            store.append(games[-1])
+        self.assertTrue(store.needs_compaction())
+        store.save(games)
+        self.assertFalse(os.path.exists(store.journal_file))
+        self.assertEqual(store.journal_count, 0)
+        self.assertEqual(self.store().load(), games)
+
+    def test_torn_tail_is_dropped(self):
+        store = self.store()
+        store.append(make_game(1))
+        store.append(make_game(2))
+        # 写到一半被打断的记录：没有换行结尾
+        with open(store.journal_file, 'ab') as f:
+            f.write('2024-01-03,2,"{""甲"": 3'.encode('utf-8'))
+        store = self.store()
+        self.assertEqual(store.load(), [make_game(1), make_game(2)])
+        with open(store.journal_file, 'rb') as f:
+            self.assertTrue(f.read().endswith(b'\n'))
+        # 之后追加的记录不会接在不完整的行后面
+        store.append(make_game(4))
+        self.assertEqual(self.store().load(), [make_game(1), make_game(2), make_game(4)])
+
+    def test_incomplete_last_line_with_newline_is_dropped(self):
+        store = self.store()
+        store.append(make_game(1))
+        with open(store.journal_file, 'ab') as f:
+            f.write(b'2024-01-03,2,"{\r\n')
+        self.assertEqual(self.store().load(), [make_game(1)])
+
+    def test_corrupt_middle_row_keeps_later_rows(self):
+        store = self.store()
+        store.append(make_game(1))
+        with open(store.journal_file, 'ab') as f:
+            f.write(b'2024-01-02,x,"{}",\r\n')
+        store.append(make_game(3))
+        with open(store.journal_file, 'rb') as f:
+            before = f.read()
+        self.assertEqual(self.store().load(), [make_game(1), make_game(3)])
+        # 中间的坏行不当作中断的结尾，文件保持不变
+        with open(store.journal_file, 'rb') as f:
+            self.assertEqual(f.read(), before)
+
+    def test_recover_finishes_interrupted_merge(self):
+        store = self.store()
+        store.save([make_game(0)])
+        store.append(make_game(1))
+        # 模拟合并时已写好临时文件并移走日志，但主文件尚未替换就退出
+        with open(store.tmp_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=store.fieldnames)
+            writer.writeheader()
+            for game in (make_game(0), make_game(1)):
+                writer.writerow(store._row(game))
+        os.replace(store.journal_file, store.merging_file)
+        self.assertEqual(self.store().load(), [make_game(0), make_game(1)])
+        self.assertFalse(os.path.exists(store.merging_file))
+        self.assertFalse(os.path.exists(store.tmp_file))
+
+    def test_recover_discards_unstarted_merge(self):
+        store = self.store()
+        store.save([make_game(0)])
+        store.append(make_game(1))
+        with open(store.tmp_file, 'w', encoding='utf-8') as f:
+            f.write("半个临时文件")
+        self.assertEqual(self.store().load(), [make_game(0), make_game(1)])
+        self.assertFalse(os.path.exists(store.tmp_file))
+
+    def test_save_keeps_rows_appended_by_other_programs(self):
+        store = self.store()
+        store.save([make_game(0)])
+        with open(self.games_file, 'ab') as f:
+            f.write('2024-01-02,2,"{""甲"": 1, ""乙"": 99}",乙\r\n'.encode('utf-8'))
+        # 检查之前先整体保存（例如合并日志），外部追加的记录写在后面并留给下一次检查
+        store.save([make_game(0), make_game(5)])
+        self.assertEqual(store.read_appended(), [make_game(1)])
+        self.assertEqual(store.read_appended(), [])
+        self.assertEqual(self.store().load(), [make_game(0), make_game(5), make_game(1)])
+
+    def test_save_of_earlier_snapshot_keeps_rows_read_since(self):
+        store = self.store()
+        store.save([make_game(0)])
+        # 后台保存任务提交时取的快照
+        snapshot, mark = [make_game(0)], store.follow_mark()
+        with open(self.games_file, 'ab') as f:
+            f.write('2024-01-02,2,"{""甲"": 1, ""乙"": 99}",乙\r\n'.encode('utf-8'))
+        # 保存执行之前，跟随检查已读入外部追加的记录
+        self.assertEqual(store.read_appended(), [make_game(1)])
+        store.save(snapshot, mark)
+        self.assertEqual(store.read_appended(), [])
+        self.assertEqual(self.store().load(), [make_game(0), make_game(1)])
+        # 包含该记录的快照保存之后不再补写
+        store.save([make_game(0), make_game(1)], store.follow_mark())
+        self.assertEqual(self.store().load(), [make_game(0), make_game(1)])
+
+    def test_v1_file_is_migrated(self):
+        with open(self.games_file, 'w', newline='', encoding='utf-8') as f:
+            f.write("date,player_count,scores,winner\r\n")
+            f.write("2024-01-01,2,\"{'甲': 1, '乙': 2}\",乙\r\n")
+        expected = [{'date': '2024-01-01', 'player_count': 2, 'scores': {'甲': 1, '乙': 2}, 'winner': '乙'}]
+        self.assertEqual(self.store().load(), expected)
+        with open(self.games_file, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.readline().strip(), "date,player_count,scores_json,winner")
+        self.assertEqual(self.store().load(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
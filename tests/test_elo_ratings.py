@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+EloRatings 的增量更新与按日期顺序重新计算的结果一致，补录更早日期的记录时标记为过期并重新计算。
+
+用法: python -m pytest tests
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Boardgame_management import CsvStorage, EloRatings, GameRecord, PlayerRegistry, ScoreData, rank_game
+
+NAMES = ['甲', '乙', '丙', '丁']
+
+
+def make_game(rng, date, names=NAMES):
+    players = rng.sample(names, rng.randint(2, len(names)))
+    scores = {name: rng.randint(0, 20) for name in players}
+    return {'date': date, 'player_count': len(players), 'scores': scores, 'winner': max(scores, key=scores.get)}
+
+
+class EloRatingsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(0)
+        self.registry = PlayerRegistry(NAMES)
+        self.games = [self.record(f"2024-01-{day:02d}") for day in range(1, 21)]
+
+    def record(self, date, names=NAMES):
+        return rank_game(GameRecord.from_dict(make_game(self.rng, date, names), self.registry))
+
+    def assert_same_ratings(self, elo, expected):
+        for name in elo.registry.names:
+            rating, count = elo.rating(name)
+            expected_rating, expected_count = expected.rating(name)
+            self.assertAlmostEqual(rating, expected_rating, msg=name)
+            self.assertEqual(count, expected_count, msg=name)
+
+    def test_catch_up_matches_full_computation(self):
+        elo = EloRatings(self.registry, self.games[:10])
+        elo.catch_up(self.games)
+        self.assertFalse(elo.stale)
+        self.assert_same_ratings(elo, EloRatings(self.registry, self.games))
+
+    def test_same_date_and_new_players_are_not_stale(self):
+        elo = EloRatings(self.registry, self.games)
+        self.games.append(self.record("2024-01-20"))
+        # 新登记的玩家从初始评分开始
+        self.games.append(self.record("2024-01-21", ['甲', '戊', '己']))
+        elo.catch_up(self.games)
+        self.assertFalse(elo.stale)
+        self.assert_same_ratings(elo, EloRatings(self.registry, self.games))
+
+    def test_earlier_date_marks_stale(self):
+        elo = EloRatings(self.registry, self.games)
+        self.games.append(self.record("2024-01-05"))
+        self.games.append(self.record("2024-01-25"))
+        elo.catch_up(self.games)
+        self.assertTrue(elo.stale)
+        self.assertEqual(elo.applied, len(self.games))
+
+    def test_score_data_recomputes_stale_ratings(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        data = ScoreData(CsvStorage(os.path.join(tmp_dir, "players.csv"), os.path.join(tmp_dir, "games.csv")))
+        for day in range(1, 11):
+            data.add_game(make_game(self.rng, f"2024-01-{day:02d}"))
+        data.elo_ratings()
+        data.add_game(make_game(self.rng, "2024-01-03"))
+        elo = data.elo_ratings()
+        self.assertFalse(elo.stale)
+        self.assert_same_ratings(elo, EloRatings(data.registry, data.games))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+RollingLeaderboards 的增量窗口与按窗口内记录重新计算的结果一致：日期乱序插入、起始日期推移、窗口淘汰。
+
+用法: python -m pytest tests
+"""
+
+import os
+import random
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Boardgame_management import GameRecord, LeaderboardStats, PlayerRegistry, RollingLeaderboards, rank_game
+
+NAMES = ['甲', '乙', '丙', '丁', '戊']
+TODAY = datetime(2024, 6, 30)
+
+
+def make_game(registry, rng, date):
+    players = rng.sample(NAMES, rng.randint(2, 4))
+    scores = {name: rng.randint(0, 20) for name in players}
+    winner = max(scores, key=scores.get)
+    return rank_game(GameRecord.from_dict({'date': date, 'player_count': len(players), 'scores': scores,
+                                           'winner': winner}, registry))
+
+
+def day(offset):
+    return (TODAY - timedelta(days=offset)).strftime("%Y-%m-%d")
+
+
+class RollingLeaderboardsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(0)
+        self.registry = PlayerRegistry(NAMES)
+        self.games = [make_game(self.registry, self.rng, day(self.rng.randint(0, 20))) for _ in range(60)]
+        self.rolling = RollingLeaderboards(self.registry, self.games)
+
+    def add(self, date):
+        game = make_game(self.registry, self.rng, date)
+        self.games.append(game)
+        self.rolling.add_game(len(self.games) - 1, game)
+
+    def assert_matches(self, stats, games):
+        """与只用 games 重新计算的统计一致"""
+        expected = LeaderboardStats(self.registry, games).leaderboard(NAMES)
+        actual = stats.leaderboard(NAMES)
+        for name in NAMES:
+            for key, value in expected[name].items():
+                self.assertAlmostEqual(actual[name][key], value, msg=f"{name} {key}")
+
+    def test_last_games_slides_window(self):
+        self.assert_matches(self.rolling.last_games(10), self.games[-10:])
+        for offset in range(15):
+            self.add(day(offset))
+        self.assert_matches(self.rolling.last_games(10), self.games[-10:])
+
+    def test_last_days_with_dates_out_of_order(self):
+        self.assert_matches(self.rolling.last_days(7, TODAY), [game for game in self.games if game.date >= day(6)])
+        # 补录的旧记录：窗口内的计入，窗口外的不计入
+        for offset in (3, 10, 0, 6, 7, 30, 1):
+            self.add(day(offset))
+        self.assert_matches(self.rolling.last_days(7, TODAY), [game for game in self.games if game.date >= day(6)])
+
+    def test_last_days_cutoff_advances(self):
+        self.rolling.last_days(7, TODAY)
+        self.add(day(0))
+        later = TODAY + timedelta(days=3)
+        cutoff = (later - timedelta(days=6)).strftime("%Y-%m-%d")
+        self.assert_matches(self.rolling.last_days(7, later), [game for game in self.games if game.date >= cutoff])
+
+    def test_evicts_least_recently_used_windows(self):
+        for count in (1, 2, 3, 4):
+            self.rolling.last_games(count)
+        self.rolling.last_games(1)
+        self.rolling.last_games(5)
+        self.assertEqual(list(self.rolling.game_windows), [3, 4, 1, 5])
+        # 被淘汰的窗口不再更新，再次使用时重建
+        for offset in range(5):
+            self.add(day(offset))
+        self.assert_matches(self.rolling.last_games(2), self.games[-2:])
+        self.assertEqual(list(self.rolling.game_windows), [4, 1, 5, 2])
+        for count in (1, 5):
+            self.assert_matches(self.rolling.last_games(count), self.games[-count:])
+
+
+if __name__ == "__main__":
+    unittest.main()
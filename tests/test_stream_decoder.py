@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+StreamDecoder 的编码识别：GBK 文件、UTF-8 BOM、跨块识别，以及混有其他编码的行的逐行回退。
+
+用法: python -m pytest tests
+"""
+
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Boardgame_management import StreamDecoder
+
+TEXT = "date,player_count,scores_json,winner\n2024-01-01,2,\"{\"\"张三\"\": 10, \"\"李四\"\": 5}\",张三\n"
+
+
+def decode(data, encoding=None, chunk_size=1 << 20):
+    decoder = StreamDecoder(io.BytesIO(data), encoding, chunk_size)
+    return ''.join(decoder), decoder.encoding
+
+
+class StreamDecoderTest(unittest.TestCase):
+
+    def test_utf8(self):
+        self.assertEqual(decode(TEXT.encode('utf-8')), (TEXT, 'utf-8'))
+
+    def test_gbk_is_sniffed(self):
+        self.assertEqual(decode(TEXT.encode('gbk')), (TEXT, 'gbk'))
+
+    def test_bom_is_stripped(self):
+        self.assertEqual(decode(b'\xef\xbb\xbf' + TEXT.encode('utf-8')), (TEXT, 'utf-8'))
+
+    def test_sniffs_first_non_ascii_chunk(self):
+        # 前面的块都是ASCII，编码由之后第一段非ASCII内容决定
+        text = "a,b\n" * 50 + TEXT
+        self.assertEqual(decode(text.encode('gbk'), chunk_size=16), (text, 'gbk'))
+
+    def test_lines_keep_line_endings(self):
+        decoder = StreamDecoder(io.BytesIO("甲\r\n乙\n丙".encode('gbk')), chunk_size=4)
+        self.assertEqual(list(decoder), ["甲\r\n", "乙\n", "丙"])
+
+    def test_gbk_lines_in_utf8_file(self):
+        # 本程序写入的 UTF-8 文件末尾被其他程序追加了 GBK 的行
+        utf8_line = "2024-01-01,2,张三,李四\n"
+        gbk_line = "2024-01-02,2,王五,赵六\n"
+        text, encoding = decode(utf8_line.encode('utf-8') * 3 + gbk_line.encode('gbk'))
+        self.assertEqual(encoding, 'utf-8')
+        self.assertEqual(text, utf8_line * 3 + gbk_line)
+
+    def test_utf8_lines_in_gbk_file(self):
+        # 只有按已识别的编码解码出错的行才逐行回退（“玩家”的 UTF-8 字节不是合法的 GBK）
+        gbk_line = "2024-01-01,2,张三,李四\n"
+        utf8_line = "2024-01-02,2,玩家,李四\n"
+        text, encoding = decode(gbk_line.encode('gbk') * 3 + utf8_line.encode('utf-8'))
+        self.assertEqual(encoding, 'gbk')
+        self.assertEqual(text, gbk_line * 3 + utf8_line)
+
+    def test_cached_encoding_is_used(self):
+        self.assertEqual(decode(TEXT.encode('gbk'), encoding='gbk'), (TEXT, 'gbk'))
+
+
+if __name__ == "__main__":
+    unittest.main()